@@ -0,0 +1,54 @@
+"""Reusable building blocks for the Contextual Retrieval notebook.
+
+Submodules are imported on first attribute access, and heavy dependencies
+(torch, transformers, bert_score, langchain, pinecone, nltk) only when the
+code that needs them runs, so `from contextual_rag import fusion_rank_search`
+stays cheap in worker processes.
+"""
+
+import importlib
+
+_EXPORTS = {
+    'splitting': ['MARKDOWN_SEPARATORS', 'OffsetTextSplitter', 'TextSpan', 'split_documents'],
+    'context_assembly': ['ChunkSource', 'assemble_context', 'build_chunk_sources', 'summarize_assembly_reports'],
+    'answer_cache': ['CachedQueryEmbeddings', 'SemanticAnswerCache', 'compute_index_version', 'get_cached_answer'],
+    'streaming': ['AnswerStream', 'StreamMetrics', 'collect_stream', 'get_stream_answer', 'stream_rag_answer', 'summarize_stream_metrics'],
+    'bm25': ['BM25Postings'],
+    'fusion': ['apply_rerank_scores', 'fuse_scores', 'fuse_top_scores', 'rerank_batch'],
+    'query_service': ['MicroBatchingQueryService', 'ServiceOverloaded', 'ServiceStopped'],
+    'quantized_index': ['QuantizedDenseIndex', 'evaluate_quantized_index'],
+    'cascade': ['CascadeThresholds', 'calibrate_cascade_thresholds', 'cascade_rank_search', 'evaluate_cascade'],
+    'local_embeddings': ['LocalEmbeddings', 'benchmark_embeddings'],
+    'sharded_retrieval': ['ShardedRetriever'],
+    'retrieval': [
+        'RERANKER_MODEL', 'Reranker', 'ensure_punkt', 'fusion_rank_search', 'get_reranker', 'get_reranker_score',
+        'rerank_results',
+    ],
+    'indexing': [
+        'Chunk', 'ProcessedDocument', 'contextualize_chunks', 'create_bm25', 'create_context_chain',
+        'create_local_index', 'create_pinecone_indexes', 'generate_context', 'get_context', 'process_documents',
+    ],
+    'evaluation': [
+        'compare_rag_evaluations', 'create_answer_chain', 'evaluate_rag_system', 'get_generate_amswer',
+        'print_evaluation_results',
+    ],
+    'model_pool': ['WarmModelPool'],
+    'bertscore_stage': ['BERTScoreStage', 'benchmark_bertscore'],
+}
+
+_ATTRIBUTE_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_ATTRIBUTE_MODULES)
+
+
+def __getattr__(name: str):
+    module_name = _ATTRIBUTE_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,206 @@
+"""Semantic answer cache for near-duplicate queries.
+
+Entries are keyed on the query embedding, so a paraphrase whose embedding is
+within `similarity_threshold` (cosine) of a cached query reuses its answer and
+skips retrieval, reranking and generation.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+
+def compute_index_version(chunks: list[str], *extra: Any) -> str:
+    """Fingerprint of the indexed chunks (plus e.g. model names) used to invalidate cached answers."""
+    digest = hashlib.sha1()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    for item in extra:
+        digest.update(repr(item).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CacheEntry:
+    def __init__(self, query: str, embedding: np.ndarray, answer: Any, latency: float, created_at: float):
+        self.query = query
+        self.embedding = embedding
+        self.answer = answer
+        self.latency = latency  # seconds the uncached path took to produce the answer
+        self.created_at = created_at
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = 3600,
+        index_version: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.index_version = index_version
+        self._clock = clock
+        # Row in _matrix -> entry, least recently used first
+        self._entries: OrderedDict[int, CacheEntry] = OrderedDict()
+        # Normalized embeddings in a preallocated (max_entries, dim) array, written in place
+        self._matrix: Optional[np.ndarray] = None
+        self._active = np.zeros(max_entries, dtype=bool)
+        self._created_at = np.zeros(max_entries)
+        self._free_rows: list[int] = []
+        self._rows_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def set_index_version(self, index_version: str):
+        if index_version != self.index_version:
+            self.clear()
+            self.index_version = index_version
+
+    def clear(self):
+        self._entries.clear()
+        self._active[:] = False
+        self._free_rows = []
+        self._rows_used = 0
+
+    def _release(self, row: int):
+        del self._entries[row]
+        self._active[row] = False
+        self._free_rows.append(row)
+
+    def _evict_expired(self, now: float):
+        if self.ttl_seconds is None or not self._entries:
+            return
+        rows = self._rows_used
+        expired = np.flatnonzero(self._active[:rows] & (now - self._created_at[:rows] > self.ttl_seconds))
+        for row in expired:
+            self._release(int(row))
+
+    def lookup(self, query_embedding, index_version: Optional[str] = None) -> Optional[CacheEntry]:
+        if index_version is not None:
+            self.set_index_version(index_version)
+        now = self._clock()
+        self._evict_expired(now)
+        if not self._entries:
+            self.misses += 1
+            return None
+
+        query = _normalize(query_embedding)
+        similarities = self._matrix[:self._rows_used] @ query
+        similarities[~self._active[:self._rows_used]] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(best)
+        entry = self._entries[best]
+        self.hits += 1
+        self.latency_saved += entry.latency
+        return entry
+
+    def put(self, query: str, query_embedding, answer: Any, latency: float = 0.0, index_version: Optional[str] = None):
+        if index_version is not None:
+            self.set_index_version(index_version)
+        embedding = _normalize(query_embedding)
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+        elif embedding.shape[0] != self._matrix.shape[1]:
+            raise ValueError(f"Embedding has {embedding.shape[0]} dimensions, cache holds {self._matrix.shape[1]}")
+
+        # Evict the least recently used entry and reuse its row
+        if len(self._entries) >= self.max_entries:
+            self._release(next(iter(self._entries)))
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = self._rows_used
+            self._rows_used += 1
+
+        now = self._clock()
+        self._matrix[row] = embedding
+        self._active[row] = True
+        self._created_at[row] = now
+        self._entries[row] = CacheEntry(query, embedding, answer, latency, now)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'latency_saved_seconds': round(self.latency_saved, 4),
+        }
+
+
+def _normalize(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class CachedQueryEmbeddings:
+    """
+    Wraps an embedding model so the query embedding computed for the cache
+    lookup is reused by fusion_rank_search instead of embedding the query twice.
+    """
+
+    def __init__(self, model, max_entries: int = 256):
+        self.model = model
+        self.max_entries = max_entries
+        self._cache: OrderedDict[str, list[float]] = OrderedDict()
+
+    def embed_query(self, text: str) -> list[float]:
+        if text in self._cache:
+            self._cache.move_to_end(text)
+            return self._cache[text]
+        embedding = self.model.embed_query(text)
+        self._cache[text] = embedding
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return embedding
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.model.embed_documents(texts)
+
+
+def get_cached_answer(
+    query: str,
+    embedding_model: CachedQueryEmbeddings,
+    answer_query: Callable[[str], Any],
+    cache: SemanticAnswerCache,
+    index_version: Optional[str] = None,
+) -> tuple[Any, bool]:
+    """
+    Answer a query through the semantic cache.
+
+    Args:
+        query: User question
+        embedding_model: Query-embedding cache shared with the fusion_rank_search call inside answer_query
+        answer_query: Full query path (retrieval, reranking, generation) for a cache miss
+        cache: Semantic answer cache
+        index_version: Current index version, a change drops all cached answers
+
+    Returns:
+        Tuple of the answer and whether it was served from the cache
+    """
+    query_embedding = embedding_model.embed_query(query)
+    entry = cache.lookup(query_embedding, index_version=index_version)
+    if entry is not None:
+        return entry.answer, True
+
+    start = time.perf_counter()
+    answer = answer_query(query)
+    cache.put(query, query_embedding, answer, latency=time.perf_counter() - start, index_version=index_version)
+    return answer, False
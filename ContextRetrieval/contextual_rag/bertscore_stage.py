@@ -0,0 +1,331 @@
+"""Batched, cached BERTScore evaluation stage.
+
+bert_score.score re-embeds every reference and candidate on each call, so
+compare_rag_evaluations embeds the same reference answers once per
+configuration. BERTScoreStage keeps per-sentence embeddings (optionally on disk
+across runs), embeds only unseen sentences in length-sorted batches and can run
+incrementally from a background thread while answers are still being
+generated. Embedding and greedy matching use bert_score's own
+get_bert_embedding / greedy_cos_idf with the same defaults as
+bert_score.score(lang="en"). Cached embeddings are computed in different
+batches than bert_score.score would use, and padding to a different length
+changes the float32 reductions, so P/R/F1 match the single-call results to
+within float noise rather than bit for bit; benchmark_bertscore checks the
+difference against an explicit tolerance.
+"""
+
+import os
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+
+class BERTScoreStage:
+    def __init__(
+        self,
+        lang: str = "en",
+        model_type: Optional[str] = None,
+        num_layers: Optional[int] = None,
+        batch_size: int = 64,
+        max_tokens_per_batch: Optional[int] = 16384,
+        device: Optional[str] = None,
+        cache_path: Optional[str] = None,
+    ):
+        """
+        Args:
+            lang: Language used to pick the default model, like bert_score.score
+            model_type: Model name, defaults to bert_score's model for lang
+            num_layers: Layer used for embeddings, defaults to bert_score's choice for model_type
+            batch_size: Maximum sentences per forward pass and per greedy matching batch
+            max_tokens_per_batch: Maximum padded tokens per forward pass, None disables the cap
+            device: Torch device, defaults to cuda when available
+            cache_path: File the embedding cache is loaded from and saved to, shared across runs
+        """
+        from bert_score.utils import lang2model, model2layers
+
+        self.model_type = model_type or lang2model[lang.lower()]
+        self.num_layers = num_layers or model2layers[self.model_type]
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.device = device
+        self.cache_path = cache_path
+        self._model = None
+        self._tokenizer = None
+        self._idf_dict = None
+        # sentence -> (token embeddings, idf weights) on CPU
+        self._cache: dict = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.embed_seconds = 0.0
+        self.match_seconds = 0.0
+        self._pairs: list[tuple[str, str]] = []
+        self._queue: Optional[queue.Queue] = None
+        self._worker: Optional[threading.Thread] = None
+        self._worker_error: Optional[BaseException] = None
+        if cache_path is not None and os.path.exists(cache_path):
+            self.load_cache(cache_path)
+
+    def _load(self):
+        if self._model is not None:
+            return
+        import torch
+        from bert_score.utils import get_model, get_tokenizer
+
+        if self.device is None:
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self._tokenizer = get_tokenizer(self.model_type, False)
+        self._model = get_model(self.model_type, self.num_layers, False)
+        self._model.to(self.device)
+        # Same idf weights as bert_score.score with idf=False
+        self._idf_dict = defaultdict(lambda: 1.0)
+        self._idf_dict[self._tokenizer.sep_token_id] = 0
+        self._idf_dict[self._tokenizer.cls_token_id] = 0
+
+    def _batches(self, sentences: list[str]) -> list[list[str]]:
+        lengths = {sentence: len(self._tokenizer.encode(sentence, truncation=True)) for sentence in sentences}
+        ordered = sorted(sentences, key=lambda sentence: lengths[sentence], reverse=True)
+        batches = []
+        batch: list[str] = []
+        for sentence in ordered:
+            # Sorted descending, so the first sentence of a batch sets its padded length
+            padded_len = lengths[batch[0]] if batch else lengths[sentence]
+            too_many_tokens = self.max_tokens_per_batch is not None and batch and (len(batch) + 1) * padded_len > self.max_tokens_per_batch
+            if len(batch) == self.batch_size or too_many_tokens:
+                batches.append(batch)
+                batch = []
+            batch.append(sentence)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def embed(self, sentences: list[str]):
+        """Embed the sentences that are not cached yet."""
+        from bert_score.utils import get_bert_embedding
+
+        missing = list(dict.fromkeys(sentence for sentence in sentences if sentence not in self._cache))
+        self.cache_hits += len(sentences) - len(missing)
+        self.cache_misses += len(missing)
+        if not missing:
+            return
+        self._load()
+        start = time.perf_counter()
+        for batch in self._batches(missing):
+            embs, masks, padded_idf = get_bert_embedding(batch, self._model, self._tokenizer, self._idf_dict, device=self.device)
+            embs, masks, padded_idf = embs.cpu(), masks.cpu(), padded_idf.cpu()
+            for i, sentence in enumerate(batch):
+                sequence_len = masks[i].sum().item()
+                self._cache[sentence] = (embs[i, :sequence_len], padded_idf[i, :sequence_len])
+        self.embed_seconds += time.perf_counter() - start
+
+    def _pad_batch_stats(self, sentences: list[str]):
+        import torch
+        from torch.nn.utils.rnn import pad_sequence
+
+        emb, idf = zip(*[self._cache[sentence] for sentence in sentences])
+        emb = [e.to(self.device) for e in emb]
+        idf = [i.to(self.device) for i in idf]
+        lens = torch.tensor([e.size(0) for e in emb], dtype=torch.long)
+        emb_pad = pad_sequence(emb, batch_first=True, padding_value=2.0)
+        idf_pad = pad_sequence(idf, batch_first=True)
+        pad_mask = (torch.arange(int(lens.max()), dtype=torch.long).expand(len(lens), int(lens.max())) < lens.unsqueeze(1)).to(self.device)
+        return emb_pad, pad_mask, idf_pad
+
+    def score(self, cands: list[str], refs: list[str]):
+        """Drop-in for bert_score.score(cands, refs, lang=...): returns P, R, F1 tensors."""
+        import torch
+        from bert_score.utils import greedy_cos_idf
+
+        self.embed(refs + cands)
+        self._load()
+        start = time.perf_counter()
+        preds = []
+        with torch.no_grad():
+            for batch_start in range(0, len(refs), self.batch_size):
+                ref_stats = self._pad_batch_stats(refs[batch_start:batch_start + self.batch_size])
+                hyp_stats = self._pad_batch_stats(cands[batch_start:batch_start + self.batch_size])
+                P, R, F1 = greedy_cos_idf(*ref_stats, *hyp_stats, False)
+                preds.append(torch.stack((P, R, F1), dim=-1).cpu())
+        self.match_seconds += time.perf_counter() - start
+        if not preds:
+            empty = torch.zeros(0)
+            return empty, empty, empty
+        all_preds = torch.cat(preds, dim=0)
+        return all_preds[..., 0], all_preds[..., 1], all_preds[..., 2]
+
+    # Incremental mode: embed answers in the background while generation continues
+
+    def start(self, references: Optional[list[str]] = None):
+        """Start a background embedding thread; references known up front are embedded first."""
+        self._pairs = []
+        self._worker_error = None
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run_worker, daemon=True)
+        self._worker.start()
+        if references:
+            self._queue.put(list(references))
+
+    def _run_worker(self):
+        pending: list[str] = []
+        while True:
+            item = self._queue.get()
+            if item is not None:
+                pending.extend(item)
+            # Wait for a full batch unless the stage is finishing
+            if pending and (item is None or len(pending) >= self.batch_size):
+                try:
+                    self.embed(pending)
+                except BaseException as e:
+                    self._worker_error = e
+                pending = []
+            if item is None:
+                return
+
+    def add(self, candidate: str, reference: str):
+        if self._queue is None:
+            self.start()
+        self._pairs.append((candidate, reference))
+        self._queue.put([reference, candidate])
+
+    def finish(self):
+        """Wait for background embedding and return P, R, F1 for every added pair, in order."""
+        if self._queue is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._queue = None
+        if self._worker_error is not None:
+            raise self._worker_error
+        cands = [candidate for candidate, _ in self._pairs]
+        refs = [reference for _, reference in self._pairs]
+        result = self.score(cands, refs)
+        if self.cache_path is not None:
+            self.save_cache(self.cache_path)
+        return result
+
+    def save_cache(self, path: str):
+        import torch
+        torch.save({'model_type': self.model_type, 'num_layers': self.num_layers, 'embeddings': self._cache}, path)
+
+    def load_cache(self, path: str):
+        import torch
+        saved = torch.load(path)
+        if saved['model_type'] == self.model_type and saved['num_layers'] == self.num_layers:
+            self._cache.update(saved['embeddings'])
+
+    def cache_bytes(self) -> int:
+        return sum(emb.element_size() * emb.nelement() + idf.element_size() * idf.nelement() for emb, idf in self._cache.values())
+
+    def stats(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'cached_sentences': len(self._cache),
+            'cache_MB': round(self.cache_bytes() / 1e6, 2),
+            'cache_hit_rate': round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            'embed_seconds': round(self.embed_seconds, 3),
+            'match_seconds': round(self.match_seconds, 3),
+        }
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process, None where it cannot be measured."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return getattr(psutil.Process().memory_info(), 'peak_wset', 0) / 1e6 or None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1024
+
+
+def _benchmark_worker(approach: str, candidate_sets: dict, references: list[str], stage_kwargs: dict) -> dict:
+    import torch
+
+    stage = BERTScoreStage(**stage_kwargs)
+    if stage.device is None:
+        stage.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    cuda = stage.device.startswith('cuda')
+
+    start = time.perf_counter()
+    if approach == 'single_call':
+        import bert_score
+        # Current approach: one bert_score.score call per configuration, same model and layer as the stage
+        scores = {
+            name: bert_score.score(cands, references, model_type=stage.model_type, num_layers=stage.num_layers, device=stage.device)
+            for name, cands in candidate_sets.items()
+        }
+    else:
+        scores = {name: stage.score(cands, references) for name, cands in candidate_sets.items()}
+    seconds = time.perf_counter() - start
+    return {
+        'seconds': seconds,
+        'peak_MB': torch.cuda.max_memory_allocated() / 1e6 if cuda else _peak_rss_mb(),
+        'scores': {name: [values.tolist() for values in prf] for name, prf in scores.items()},
+        'stats': stage.stats() if approach == 'staged' else {},
+    }
+
+
+def benchmark_bertscore(
+    candidate_sets: dict,
+    references: list[str],
+    stage_kwargs: Optional[dict] = None,
+    tolerance: float = 1e-5,
+    mp_context: str = "spawn",
+) -> dict:
+    """
+    Score several configurations (e.g. contextual and regular answers) against the same
+    references, once with a bert_score.score call per configuration and once with a
+    shared BERTScoreStage, and compare results, wall time and memory.
+
+    Each approach runs in its own fresh process, so the peak memory figures (CUDA
+    allocator peak, or peak RSS on CPU) belong to that approach alone.
+
+    Args:
+        candidate_sets: Configuration name -> generated answers, aligned with references
+        references: Reference answers
+        stage_kwargs: BERTScoreStage arguments, also used to pick the model for bert_score.score
+        tolerance: Largest allowed absolute P/R/F1 difference to bert_score.score
+        mp_context: multiprocessing start method for the measurement processes
+
+    Raises:
+        AssertionError: If any score differs from bert_score.score by more than tolerance
+    """
+    stage_kwargs = stage_kwargs or {}
+    runs = {}
+    for approach in ('single_call', 'staged'):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context(mp_context)) as executor:
+            runs[approach] = executor.submit(_benchmark_worker, approach, candidate_sets, references, stage_kwargs).result()
+
+    max_abs_diff = max(
+        (
+            abs(a - b)
+            for name in candidate_sets
+            for single_values, staged_values in zip(runs['single_call']['scores'][name], runs['staged']['scores'][name])
+            for a, b in zip(single_values, staged_values)
+        ),
+        default=0.0,
+    )
+    if max_abs_diff > tolerance:
+        raise AssertionError(f"BERTScore stage differs from bert_score.score by {max_abs_diff:.3g}, tolerance is {tolerance:.3g}")
+
+    def round_mb(value):
+        return round(value, 1) if value is not None else None
+
+    return {
+        'configurations': len(candidate_sets),
+        'pairs': len(references),
+        'single_call_seconds': round(runs['single_call']['seconds'], 3),
+        'staged_seconds': round(runs['staged']['seconds'], 3),
+        'single_call_peak_MB': round_mb(runs['single_call']['peak_MB']),
+        'staged_peak_MB': round_mb(runs['staged']['peak_MB']),
+        'max_abs_diff': max_abs_diff,
+        'tolerance': tolerance,
+        **runs['staged']['stats'],
+    }
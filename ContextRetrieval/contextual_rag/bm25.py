@@ -0,0 +1,72 @@
+"""Inverted-index view of a BM25Okapi model for scoring many queries at once.
+
+BM25Okapi.get_scores walks every document dictionary for every query term.
+BM25Postings turns the same statistics into per-term posting arrays so a batch
+of queries is scored with numpy, producing the same scores as get_scores.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+class BM25Postings:
+    def __init__(
+        self,
+        doc_freqs: list[dict],
+        doc_len,
+        idf: dict,
+        avgdl: float,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.corpus_size = len(doc_freqs)
+        self.idf = idf
+        self.k1 = k1
+        self.b = b
+        self.avgdl = avgdl
+        doc_len = np.asarray(doc_len, dtype=np.float64)
+        # Length normalisation term of the BM25 denominator, per document
+        self._norm = k1 * (1 - b + b * doc_len / avgdl)
+
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+        for doc_idx, freqs in enumerate(doc_freqs):
+            for term, freq in freqs.items():
+                doc_ids, term_freqs = postings.setdefault(term, ([], []))
+                doc_ids.append(doc_idx)
+                term_freqs.append(freq)
+        self._postings = {
+            term: (np.asarray(doc_ids, dtype=np.int64), np.asarray(term_freqs, dtype=np.float64))
+            for term, (doc_ids, term_freqs) in postings.items()
+        }
+
+    @classmethod
+    def from_bm25(cls, bm25, idf: Optional[dict] = None) -> "BM25Postings":
+        """Build from a fitted rank_bm25.BM25Okapi, optionally overriding its IDF table."""
+        return cls(bm25.doc_freqs, bm25.doc_len, idf if idf is not None else bm25.idf, bm25.avgdl, bm25.k1, bm25.b)
+
+    def get_scores(self, tokenized_query: list[str]) -> np.ndarray:
+        scores = np.zeros(self.corpus_size)
+        for term in tokenized_query:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, term_freqs = posting
+            scores[doc_ids] += self.idf.get(term, 0) * (term_freqs * (self.k1 + 1) / (term_freqs + self._norm[doc_ids]))
+        return scores
+
+    def get_batch_scores(self, tokenized_queries: list[list[str]]) -> np.ndarray:
+        """Scores of shape (len(tokenized_queries), corpus_size)."""
+        scores = np.zeros((len(tokenized_queries), self.corpus_size))
+        # Compute each term's contribution once for the whole batch
+        contributions: dict[str, np.ndarray] = {}
+        for row, tokenized_query in enumerate(tokenized_queries):
+            for term in tokenized_query:
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                doc_ids, term_freqs = posting
+                if term not in contributions:
+                    contributions[term] = self.idf.get(term, 0) * (term_freqs * (self.k1 + 1) / (term_freqs + self._norm[doc_ids]))
+                scores[row, doc_ids] += contributions[term]
+        return scores
@@ -0,0 +1,240 @@
+"""Adaptive cascade retrieval.
+
+fusion_rank_search + reranking always pays for BM25, a dense lookup (an
+embedding API call plus an index query) and a cross-encoder pass. The cascade
+runs the cheap local BM25 leg first and stops early when a signal is already
+decisive:
+
+1. BM25 top-1 far ahead of top-2 (e.g. an exact identifier match): skip the
+   dense leg and the reranker, return the BM25 ranking.
+2. Otherwise run the dense leg and fuse as usual. If the dense top-1 is far
+   ahead of its top-2, skip the reranker and keep the fusion order.
+3. Otherwise rerank.
+
+Thresholds are calibrated offline with calibrate_cascade_thresholds.
+"""
+
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from .context_assembly import CONTEXT_SEPARATOR
+from .fusion import apply_rerank_scores, fuse_scores
+
+
+class CascadeThresholds:
+    def __init__(self, bm25_margin: float = float("inf"), dense_margin: float = float("inf")):
+        """
+        Args:
+            bm25_margin: Relative BM25 gap (top1 - top2) / top1 above which the dense leg and reranker are skipped
+            dense_margin: Cosine gap top1 - top2 above which the reranker is skipped
+        """
+        self.bm25_margin = bm25_margin
+        self.dense_margin = dense_margin
+
+    def __repr__(self) -> str:
+        return f"CascadeThresholds(bm25_margin={self.bm25_margin}, dense_margin={self.dense_margin})"
+
+
+def _top_margin(scores: np.ndarray, relative: bool) -> float:
+    if len(scores) < 2:
+        return float("inf")
+    top2 = np.partition(scores, len(scores) - 2)[-2:]
+    first, second = float(top2[1]), float(top2[0])
+    if relative:
+        # No term of the query matches any chunk: nothing to be decisive about
+        return (first - second) / first if first > 0 else float("-inf")
+    return first - second
+
+
+def _bm25_only_results(bm25_scores: np.ndarray, chunks: list[str], k: int) -> list[dict]:
+    # Stable sort, so tied scores are ordered by the higher index like fuse_scores
+    top_indices = np.argsort(bm25_scores, kind="stable")[::-1][:k]
+    max_score = bm25_scores[top_indices[0]] or 1.0
+    return [
+        {'id': str(idx), 'score': float(bm25_scores[idx] / max_score), 'metadata': {'text': chunks[idx]}}
+        for idx in top_indices
+    ]
+
+
+def cascade_rank_search(
+    query: str,
+    bm25,
+    chunks: list[str],
+    model,
+    embedding_index,
+    get_reranker_score: Callable,
+    weight_sparse: float,
+    thresholds: CascadeThresholds,
+    k: int = 5,
+    reranker_cutoff: int = 20,
+    tokenize: Optional[Callable[[str], list[str]]] = None,
+) -> tuple[list[dict], dict]:
+    """
+    fusion_rank_search followed by reranking, short-circuited by score margins.
+
+    Returns:
+        Tuple of the results (reranked when the reranker ran) and a trace with
+        the margins, which stages were skipped and the elapsed time
+    """
+    if tokenize is None:
+        from .retrieval import word_tokenize
+        tokenize = word_tokenize
+    start = time.perf_counter()
+    trace = {'skipped_dense': False, 'skipped_reranker': False, 'bm25_margin': None, 'dense_margin': None}
+
+    bm25_scores = np.array(bm25.get_scores(tokenize(query)))
+    trace['bm25_margin'] = _top_margin(bm25_scores, relative=True)
+    bm25_results = _bm25_only_results(bm25_scores, chunks, k)
+    # The top-1 the short-circuit would return, also when the top scores tie
+    trace['bm25_top1'] = bm25_results[0]['id'] if bm25_results else None
+    if trace['bm25_margin'] >= thresholds.bm25_margin:
+        trace['skipped_dense'] = trace['skipped_reranker'] = True
+        trace['seconds'] = time.perf_counter() - start
+        return bm25_results, trace
+
+    dense_results = embedding_index.query(vector=model.embed_query(query), top_k=reranker_cutoff, include_values=False)
+    dense_scores = np.array([match['score'] for match in dense_results['matches']])
+    dense_indices = np.array([int(match['id']) for match in dense_results['matches']])
+    trace['dense_margin'] = _top_margin(dense_scores, relative=False)
+
+    retrieved_results = fuse_scores(bm25_scores, dense_scores, dense_indices, chunks, weight_sparse, k, reranker_cutoff)
+    trace['fusion_top1'] = retrieved_results[0]['id'] if retrieved_results else None
+    if trace['dense_margin'] >= thresholds.dense_margin:
+        trace['skipped_reranker'] = True
+    else:
+        pairs = [(query, result['metadata']['text']) for result in retrieved_results]
+        apply_rerank_scores(retrieved_results, get_reranker_score(pairs))
+    trace['seconds'] = time.perf_counter() - start
+    return retrieved_results, trace
+
+
+def _smallest_safe_threshold(margins: list[float], agrees: list[bool], min_agreement: float, min_support: int) -> float:
+    """Smallest margin t such that queries with margin >= t agree with the full path at least min_agreement of the time."""
+    order = np.argsort(margins, kind="stable")[::-1]
+    best = float("inf")
+    agreed = 0
+    for count, position in enumerate(order, start=1):
+        agreed += agrees[position]
+        # A threshold admits every query with an equal margin, so only evaluate it at the end of a tie group
+        if count < len(order) and margins[order[count]] == margins[position]:
+            continue
+        if margins[position] == float("-inf"):
+            break
+        if count >= min_support and agreed / count >= min_agreement:
+            best = float(margins[position])
+    return best
+
+
+def calibrate_cascade_thresholds(
+    best_answers_df,
+    bm25,
+    chunks: list[str],
+    model,
+    embedding_index,
+    get_reranker_score: Callable,
+    weight_sparse: float,
+    k: int = 5,
+    reranker_cutoff: int = 20,
+    min_agreement: float = 0.95,
+    min_support: int = 5,
+    n_samples: Optional[int] = None,
+    tokenize: Optional[Callable[[str], list[str]]] = None,
+) -> tuple[CascadeThresholds, list[dict]]:
+    """
+    Pick margin thresholds on best_answers_df so that short-circuited queries
+    return the same top-1 chunk as the full pipeline at least min_agreement of the time.
+
+    Returns:
+        Tuple of the calibrated thresholds and the per-question full-path traces
+    """
+    eval_df = best_answers_df.head(n_samples) if n_samples else best_answers_df
+    full = CascadeThresholds()
+    records = []
+    for _, row in eval_df.iterrows():
+        full_results, trace = cascade_rank_search(
+            row['question'], bm25, chunks, model, embedding_index, get_reranker_score,
+            weight_sparse, full, k, reranker_cutoff, tokenize,
+        )
+        trace['question'] = row['question']
+        trace['full_top1'] = full_results[0]['id'] if full_results else None
+        records.append(trace)
+
+    bm25_threshold = _smallest_safe_threshold(
+        [record['bm25_margin'] for record in records],
+        [record['bm25_top1'] == record['full_top1'] for record in records],
+        min_agreement, min_support,
+    )
+    dense_threshold = _smallest_safe_threshold(
+        [record['dense_margin'] for record in records],
+        [record['fusion_top1'] == record['full_top1'] for record in records],
+        min_agreement, min_support,
+    )
+    return CascadeThresholds(bm25_threshold, dense_threshold), records
+
+
+def _hits_reference(results: list[dict], reference_context: str) -> bool:
+    # Contextual chunks carry a generated preamble, only the chunk itself comes from the source document
+    return any(
+        result['metadata']['text'].split(CONTEXT_SEPARATOR, 1)[-1].strip() in reference_context
+        for result in results
+    )
+
+
+def evaluate_cascade(
+    best_answers_df,
+    bm25,
+    chunks: list[str],
+    model,
+    embedding_index,
+    get_reranker_score: Callable,
+    weight_sparse: float,
+    thresholds: CascadeThresholds,
+    k: int = 5,
+    reranker_cutoff: int = 20,
+    n_samples: Optional[int] = None,
+    tokenize: Optional[Callable[[str], list[str]]] = None,
+) -> dict:
+    """
+    Run every question through the full path and the cascade and report the
+    fraction of short-circuited queries, latency saved and retrieval-quality delta
+    (top-1 agreement and whether a top-k chunk comes from the question's source context).
+    """
+    eval_df = best_answers_df.head(n_samples) if n_samples else best_answers_df
+    full = CascadeThresholds()
+    rows = []
+    for _, row in eval_df.iterrows():
+        full_results, full_trace = cascade_rank_search(
+            row['question'], bm25, chunks, model, embedding_index, get_reranker_score,
+            weight_sparse, full, k, reranker_cutoff, tokenize,
+        )
+        cascade_results, cascade_trace = cascade_rank_search(
+            row['question'], bm25, chunks, model, embedding_index, get_reranker_score,
+            weight_sparse, thresholds, k, reranker_cutoff, tokenize,
+        )
+        rows.append({
+            'skipped_dense': cascade_trace['skipped_dense'],
+            'skipped_reranker': cascade_trace['skipped_reranker'],
+            'full_seconds': full_trace['seconds'],
+            'cascade_seconds': cascade_trace['seconds'],
+            'top1_agrees': bool(full_results and cascade_results and full_results[0]['id'] == cascade_results[0]['id']),
+            'full_hit': _hits_reference(full_results, row['context']),
+            'cascade_hit': _hits_reference(cascade_results, row['context']),
+        })
+
+    n = max(len(rows), 1)
+    full_seconds = sum(r['full_seconds'] for r in rows)
+    cascade_seconds = sum(r['cascade_seconds'] for r in rows)
+    return {
+        'questions': len(rows),
+        'skipped_dense %': round(100 * sum(r['skipped_dense'] for r in rows) / n, 2),
+        'skipped_reranker %': round(100 * sum(r['skipped_reranker'] for r in rows) / n, 2),
+        'full_seconds': round(full_seconds, 3),
+        'cascade_seconds': round(cascade_seconds, 3),
+        'latency_saved %': round(100 * (full_seconds - cascade_seconds) / full_seconds, 2) if full_seconds else 0.0,
+        'top1_agreement': round(sum(r['top1_agrees'] for r in rows) / n, 4),
+        'full_hit_rate': round(sum(r['full_hit'] for r in rows) / n, 4),
+        'cascade_hit_rate': round(sum(r['cascade_hit'] for r in rows) / n, 4),
+        'hit_rate_delta': round((sum(r['cascade_hit'] for r in rows) - sum(r['full_hit'] for r in rows)) / n, 4),
+    }
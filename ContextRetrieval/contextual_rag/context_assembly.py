@@ -0,0 +1,272 @@
+"""Token-budget-aware context assembly.
+
+Replaces the `"\\n".join` of the top reranked chunks with a context that merges
+overlapping chunks from the same source document, drops repeated contextual
+preambles and packs the merged blocks into a token budget by reranker score.
+"""
+
+from typing import Callable, NamedTuple, Optional
+
+# Contextual chunks are built as f"{context} \n\n {chunk}"
+CONTEXT_SEPARATOR = " \n\n "
+
+
+class ChunkSource(NamedTuple):
+    doc_id: int
+    start: int  # offsets of the chunk inside documents[doc_id]
+    end: int
+    context: Optional[str] = None  # generated preamble, if the chunk is contextual
+
+
+class ContextBlock:
+    def __init__(self, doc_id, start: int, end: int, body: str, score: float, preamble: Optional[str]):
+        self.doc_id = doc_id
+        self.start = start
+        self.end = end
+        self.body = body
+        self.score = score
+        self.preamble = preamble
+        self.chunk_ids: list[str] = []
+
+    def text(self, include_preamble: bool = True) -> str:
+        if include_preamble and self.preamble:
+            return f"{self.preamble}{CONTEXT_SEPARATOR}{self.body}"
+        return self.body
+
+
+def approximate_token_count(text: str) -> int:
+    # ~4 characters per token for English text with OpenAI tokenizers
+    return (len(text) + 3) // 4
+
+
+def get_token_counter(model_name: str = "gpt-3.5-turbo") -> Callable[[str], int]:
+    try:
+        import tiktoken
+    except ImportError:
+        return approximate_token_count
+    encoding = tiktoken.encoding_for_model(model_name)
+    return lambda text: len(encoding.encode(text))
+
+
+def build_chunk_sources(spans_per_doc: list[list], contexts: Optional[list[Optional[str]]] = None) -> list[ChunkSource]:
+    """
+    Flatten the output of splitting.split_documents into per-chunk sources, in
+    the same order as the chunk list used to build the indexes.
+    """
+    sources = []
+    for doc_id, spans in enumerate(spans_per_doc):
+        for span in spans:
+            context = contexts[len(sources)] if contexts is not None else None
+            sources.append(ChunkSource(doc_id, span.start, span.end, context))
+    return sources
+
+
+def _split_preamble(text: str, context: Optional[str] = None) -> tuple[Optional[str], str]:
+    if context is not None and text.startswith(context + CONTEXT_SEPARATOR):
+        return context, text[len(context) + len(CONTEXT_SEPARATOR):]
+    context, sep, chunk = text.partition(CONTEXT_SEPARATOR)
+    if not sep:
+        return None, text
+    return context, chunk
+
+
+def _suffix_prefix_overlap(left: str, right: str, min_overlap: int) -> int:
+    # Longest suffix of left that is a prefix of right
+    for size in range(min(len(left), len(right)), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _blocks_from_offsets(results: list[dict], sources: list[ChunkSource], documents: list[str]) -> list[ContextBlock]:
+    by_doc: dict[int, list[tuple[ChunkSource, dict]]] = {}
+    for result in results:
+        source = sources[int(result['id'])]
+        by_doc.setdefault(source.doc_id, []).append((source, result))
+
+    blocks = []
+    for doc_id, items in by_doc.items():
+        items.sort(key=lambda item: item[0].start)
+        doc_blocks: list[ContextBlock] = []
+        for source, result in items:
+            block = doc_blocks[-1] if doc_blocks else None
+            if block is not None and source.start <= block.end:
+                block.end = max(block.end, source.end)
+                if result['score'] > block.score:
+                    block.score = result['score']
+                    block.preamble = source.context
+            else:
+                block = ContextBlock(doc_id, source.start, source.end, "", result['score'], source.context)
+                doc_blocks.append(block)
+            block.chunk_ids.append(result['id'])
+        for block in doc_blocks:
+            block.body = documents[doc_id][block.start:block.end]
+        blocks.extend(doc_blocks)
+    return blocks
+
+
+def _merge_text_blocks(left: ContextBlock, right: ContextBlock, min_overlap: int, allow_overlap: bool) -> bool:
+    # Merge right into left when one contains the other or, if allowed, when they overlap
+    if right.body in left.body:
+        body = left.body
+    elif left.body in right.body:
+        body = right.body
+    elif not allow_overlap:
+        return False
+    elif (size := _suffix_prefix_overlap(left.body, right.body, min_overlap)):
+        body = left.body + right.body[size:]
+    elif (size := _suffix_prefix_overlap(right.body, left.body, min_overlap)):
+        body = right.body + left.body[size:]
+    else:
+        return False
+    left.body = body
+    if right.score > left.score:
+        left.score = right.score
+        left.preamble = right.preamble
+    left.chunk_ids.extend(right.chunk_ids)
+    return True
+
+
+def _blocks_from_text(
+    results: list[dict],
+    min_overlap: int,
+    contextual: bool,
+    sources: Optional[list[ChunkSource]] = None,
+) -> list[ContextBlock]:
+    blocks: list[ContextBlock] = []
+    for result in results:
+        source = sources[int(result['id'])] if sources is not None else None
+        text = result['metadata']['text']
+        if contextual:
+            preamble, body = _split_preamble(text, source.context if source is not None else None)
+        else:
+            preamble, body = None, text
+        block = ContextBlock(source.doc_id if source is not None else None, 0, 0, body, result['score'], preamble)
+        block.chunk_ids.append(result['id'])
+        blocks.append(block)
+
+    # Merging can make a block overlap one it did not overlap before, so repeat until stable.
+    # Overlapping text is only merged within one source document; without sources only
+    # exact duplicates are folded, since a short shared suffix/prefix proves nothing.
+    merged = True
+    while merged:
+        merged = False
+        for i, left in enumerate(blocks):
+            for right in blocks[i + 1:]:
+                allow_overlap = sources is not None and left.doc_id == right.doc_id
+                if _merge_text_blocks(left, right, min_overlap, allow_overlap):
+                    blocks.remove(right)
+                    merged = True
+                    break
+            if merged:
+                break
+    return blocks
+
+
+def _truncate_to_tokens(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    # Longest prefix within the budget, found by bisection on the character count
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def assemble_context(
+    retrieved_results: list[dict],
+    max_tokens: int = 2000,
+    sources: Optional[list[ChunkSource]] = None,
+    documents: Optional[list[str]] = None,
+    count_tokens: Optional[Callable[[str], int]] = None,
+    separator: str = "\n",
+    min_overlap: int = 20,
+    contextual: bool = False,
+) -> tuple[str, dict]:
+    """
+    Build the LLM context from reranked results.
+
+    Args:
+        retrieved_results: Results as returned by fusion_rank_search, with 'score' set to the reranker score
+        max_tokens: Token budget for the assembled context
+        sources: Optional per-chunk source offsets, indexed by result id; required to merge
+            overlapping chunks (exact span merging when documents are given as well)
+        documents: Source documents that sources point into
+        count_tokens: Token counting function, defaults to tiktoken when installed
+        separator: Separator between blocks, same as the plain join
+        min_overlap: Minimum shared characters to merge chunks of the same document when no documents are given
+        contextual: Results come from the contextual index, so each text starts with a generated preamble
+
+    Returns:
+        Tuple of the context string and a report with the tokens saved by merging
+        (tokens_saved) and the tokens left out to fit the budget (tokens_over_budget)
+    """
+    count_tokens = count_tokens or get_token_counter()
+
+    if sources is not None and documents is not None:
+        blocks = _blocks_from_offsets(retrieved_results, sources, documents)
+    else:
+        blocks = _blocks_from_text(retrieved_results, min_overlap, contextual, sources)
+
+    # Pack by reranker score, skipping blocks that no longer fit
+    blocks.sort(key=lambda block: block.score, reverse=True)
+    separator_tokens = count_tokens(separator)
+    seen_preambles = set()
+    deduplicated = []
+    packed = []
+    used_tokens = 0
+    dropped = 0
+    truncated = 0
+    for block in blocks:
+        include_preamble = block.preamble is not None and block.preamble not in seen_preambles
+        if include_preamble:
+            seen_preambles.add(block.preamble)
+        block_text = block.text(include_preamble)
+        deduplicated.append(block_text)
+        block_tokens = count_tokens(block_text) + (separator_tokens if packed else 0)
+        if used_tokens + block_tokens > max_tokens:
+            if packed:
+                dropped += 1
+                continue
+            # Never return an empty context: cut the top block down to the budget instead
+            block_text = _truncate_to_tokens(block_text, max_tokens, count_tokens)
+            block_tokens = count_tokens(block_text)
+            truncated += 1
+        packed.append(block_text)
+        used_tokens += block_tokens
+
+    context = separator.join(packed)
+    naive_tokens = count_tokens(separator.join(res['metadata']['text'] for res in retrieved_results))
+    deduplicated_tokens = count_tokens(separator.join(deduplicated))
+    context_tokens = count_tokens(context)
+    report = {
+        'chunks': len(retrieved_results),
+        'blocks': len(blocks),
+        'blocks_packed': len(packed),
+        'blocks_dropped': dropped,
+        'blocks_truncated': truncated,
+        'naive_tokens': naive_tokens,
+        'context_tokens': context_tokens,
+        # Merging overlaps and repeated preambles, no content lost
+        'tokens_saved': naive_tokens - deduplicated_tokens,
+        # Content left out to fit max_tokens
+        'tokens_over_budget': deduplicated_tokens - context_tokens,
+    }
+    return context, report
+
+
+def summarize_assembly_reports(reports: list[dict]) -> dict:
+    naive = sum(report['naive_tokens'] for report in reports)
+    saved = sum(report['tokens_saved'] for report in reports)
+    over_budget = sum(report['tokens_over_budget'] for report in reports)
+    return {
+        'queries': len(reports),
+        'naive_tokens': naive,
+        'context_tokens': sum(report['context_tokens'] for report in reports),
+        'tokens_saved': saved,
+        'tokens_saved %': round(100 * saved / naive, 2) if naive else 0.0,
+        'tokens_over_budget': over_budget,
+        'tokens_over_budget %': round(100 * over_budget / naive, 2) if naive else 0.0,
+    }
@@ -0,0 +1,285 @@
+"""Answer generation and BERTScore evaluation, ported from the notebook.
+
+pandas, tqdm, torch, langchain and bert_score are imported on first use.
+"""
+
+from typing import Callable, Optional, Tuple
+
+from .retrieval import fusion_rank_search, get_reranker_score as default_get_reranker_score, rerank_results
+
+ANSWER_SYSTEM_PROMPT = """You are an AI assistant specialized in answering user queries based solely on provided context. Your primary goal is to provide clear, concise, and relevant answers without adding, making up, or hallucinating any information.
+            """
+
+ANSWER_HUMAN_PROMPT = """Now, consider the following context carefully:
+      <context>
+      {context}
+      </context>
+
+      Here is the user's query:
+      <query>
+      {query}
+      </query>
+
+      Before answering, please follow these steps:
+
+      1. Analyze the user's query and the provided context:
+        a. Identify the key elements of the user's query.
+        b. Find and quote relevant information from the context.
+        c. Explicitly link the quoted information to the query elements.
+        d. Formulate a potential answer based only on the context.
+        e. Explicitly check that your answer doesn't include any information not present in the context.
+        f. If the context doesn't contain enough information to answer the query, note this.
+
+      2. After your analysis process, provide your final answer or response. Do not include your analysis steps in your final answer or response, only the result.
+
+      If the context does not contain enough information to answer the user's query confidently and accurately, your final response should be: "I do not have enough information to answer this question based on the provided context."
+
+      Remember, it's crucial that your answer is based entirely on the given context. Do not add any external information or make assumptions beyond what is explicitly stated in the context.
+
+    """
+
+
+def create_answer_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", ANSWER_SYSTEM_PROMPT),
+        ("human", ANSWER_HUMAN_PROMPT),
+    ])
+
+
+def create_answer_chain(llm):
+    from langchain_core.output_parsers import StrOutputParser
+    return create_answer_prompt() | llm | StrOutputParser()
+
+
+def get_generate_amswer(llm_chain):
+    def generate_amswer(context, query):
+        llm_response = llm_chain.invoke({
+                    "context": context,
+                    "query": query
+                })
+        return llm_response.content if hasattr(llm_response, 'content') else llm_response
+    return generate_amswer
+
+
+def evaluate_rag_system(
+    best_answers_df,
+    bm25,
+    chunks: list[str],
+    embedding_model,
+    embedding_index,
+    generate_amswer,
+    weight_sparse: float,
+    n_samples: int = None,  # Optional: limit number of samples for testing
+    reranker_cutoff: int = 20,
+    get_reranker_score: Optional[Callable] = None,
+    build_context: Optional[Callable[[list[dict]], str]] = None,
+    bertscore=None,
+):
+    """
+    Args:
+        get_reranker_score: Reranker scoring function, defaults to the lazily loaded bge reranker
+            (pass WarmModelPool.get_reranker_score to score in warm worker processes)
+        build_context: Turns the reranked results into the LLM context, defaults to a newline join
+            (e.g. lambda results: assemble_context(results)[0])
+        bertscore: Optional BERTScoreStage; answers are embedded in the background as they are
+            generated and cached embeddings are reused across runs and configurations
+    """
+    import pandas as pd
+    import torch
+    import bert_score
+    from tqdm import tqdm
+
+    get_reranker_score = get_reranker_score or default_get_reranker_score
+
+    # Initialize results storage
+    results = []
+
+    # Get subset of dataframe if n_samples is specified
+    eval_df = best_answers_df.head(n_samples) if n_samples else best_answers_df
+
+    # Embed the reference answers in the background while answers are generated
+    if bertscore is not None:
+        bertscore.start(eval_df['answer'].tolist())
+
+    # Lists to store all references and candidates for batch BERTScore computation
+    all_references = []
+    all_candidates = []
+
+    # Iterate through questions and answers
+    for idx, row in tqdm(eval_df.iterrows(), total=len(eval_df), desc="Evaluating Questions"):
+        query = row['question']
+        reference_answer = row['answer']
+
+        try:
+            # Get relevant context using fusion ranking
+            retrieved_results = fusion_rank_search(
+                query=query,
+                bm25=bm25,
+                chunks=chunks,
+                model=embedding_model,
+                embedding_index=embedding_index,
+                k=5,
+                weight_sparse=0.1,
+                reranker_cutoff=reranker_cutoff
+            )
+
+            # Rerank and use reranker scores directly for final ranking
+            rerank_results(query, retrieved_results, get_reranker_score)
+
+            # Prepare context for LLM
+            if build_context is None:
+                context = "\n".join([res['metadata']['text'] for res in retrieved_results])
+            else:
+                context = build_context(retrieved_results)
+
+            # Generate answer using LLM
+            generated_answer = generate_amswer(context, query)
+
+            # Store answers for batch BERTScore computation
+            all_references.append(reference_answer)
+            all_candidates.append(generated_answer)
+            if bertscore is not None:
+                bertscore.add(generated_answer, reference_answer)
+
+            # Store intermediate results
+            result = {
+                'question': query,
+                'reference_answer': reference_answer,
+                'generated_answer': generated_answer,
+                'retrieved_contexts': [res['metadata']['text'] for res in retrieved_results],
+                'context_scores': [res['score'] for res in retrieved_results]
+            }
+            results.append(result)
+
+        except Exception as e:
+            print(f"Error processing question {idx}: {str(e)}")
+            continue
+
+    if bertscore is not None:
+        P, R, F1 = bertscore.finish()
+    else:
+        # Calculate BERTScore for all pairs at once
+        P, R, F1 = bert_score.score(
+            all_candidates,
+            all_references,
+            lang="en",
+            verbose=True,
+            device='cuda' if torch.cuda.is_available() else 'cpu'
+        )
+
+    # Add BERTScore metrics to results
+    for idx, (p, r, f1) in enumerate(zip(P, R, F1)):
+        results[idx].update({
+            'bertscore_precision': p.item(),
+            'bertscore_recall': r.item(),
+            'bertscore_f1': f1.item()
+        })
+
+    # Convert results to DataFrame
+    results_df = pd.DataFrame(results)
+
+    # Calculate and print average scores
+    avg_scores = {
+        'Average BERTScore Precision': results_df['bertscore_precision'].mean(),
+        'Average BERTScore Recall': results_df['bertscore_recall'].mean(),
+        'Average BERTScore F1': results_df['bertscore_f1'].mean()
+    }
+
+    return results_df, avg_scores
+
+
+def print_evaluation_results(results_df, avg_scores):
+    print("\nAverage Scores:")
+    for metric, score in avg_scores.items():
+        print(f"{metric}: {score:.4f}")
+
+    print("\nDetailed Results Sample (first 3):")
+    for idx, row in results_df.head(3).iterrows():
+        print("\nQuestion:", row['question'])
+        print("Reference Answer:", row['reference_answer'])
+        print("Generated Answer:", row['generated_answer'])
+        print(f"BERTScore Precision: {row['bertscore_precision']:.4f}")
+        print(f"BERTScore Recall: {row['bertscore_recall']:.4f}")
+        print(f"BERTScore F1: {row['bertscore_f1']:.4f}")
+
+
+def compare_rag_evaluations(best_answers_df,
+                          set1_params: dict,
+                          set2_params: dict,
+                          generate_amswer,
+                          weight_sparse: float,
+                          n_samples: int = None,
+                          **evaluate_kwargs) -> Tuple:
+    """
+    Compare RAG evaluation results between two parameter sets.
+
+    Args:
+        best_answers_df: DataFrame with questions and answers
+        set1_params: Dictionary with parameters for first evaluation
+        set2_params: Dictionary with parameters for second evaluation
+        generate_amswer: Answer generation function
+        n_samples: Optional number of samples to evaluate
+        evaluate_kwargs: Extra evaluate_rag_system arguments (get_reranker_score, build_context, bertscore);
+            a shared bertscore stage embeds the reference answers only once for both sets
+
+    Returns:
+        DataFrame with comparison results and the per-question results of both sets
+    """
+    import pandas as pd
+
+    # Run evaluations for both sets
+    results1_df, avg_scores1 = evaluate_rag_system(
+        best_answers_df=best_answers_df,
+        weight_sparse=weight_sparse,
+        bm25=set1_params['bm25'],
+        chunks=set1_params['chunks'],
+        embedding_model=set1_params['embedding_model'],
+        embedding_index=set1_params['embedding_index'],
+        generate_amswer=generate_amswer,
+        n_samples=n_samples,
+        **evaluate_kwargs
+    )
+
+    print_evaluation_results(results1_df, avg_scores1)
+
+    results2_df, avg_scores2 = evaluate_rag_system(
+        best_answers_df=best_answers_df,
+        weight_sparse=weight_sparse,
+        bm25=set2_params['bm25'],
+        chunks=set2_params['chunks'],
+        embedding_model=set2_params['embedding_model'],
+        embedding_index=set2_params['embedding_index'],
+        generate_amswer=generate_amswer,
+        n_samples=n_samples,
+        **evaluate_kwargs
+    )
+
+    print_evaluation_results(results2_df, avg_scores2)
+    # Create comparison DataFrame
+    comparison = pd.DataFrame({
+        'Metric': ['BERTScore Precision', 'BERTScore Recall', 'BERTScore F1'],
+        'Contextual': [
+            avg_scores1['Average BERTScore Precision'],
+            avg_scores1['Average BERTScore Recall'],
+            avg_scores1['Average BERTScore F1']
+        ],
+        'Regular': [
+            avg_scores2['Average BERTScore Precision'],
+            avg_scores2['Average BERTScore Recall'],
+            avg_scores2['Average BERTScore F1']
+        ]
+    })
+
+    # Calculate differences
+    comparison['Difference'] = comparison['Contextual'] - comparison['Regular']
+
+    # Calculate percentage difference
+    # Formula: ((new - old) / old) * 100
+    comparison['Difference %'] = ((comparison['Contextual'] - comparison['Regular']) / comparison['Regular'] * 100).round(2)
+
+    # Format numbers to 4 decimal places
+    for col in ['Contextual', 'Regular', 'Difference', 'Difference %']:
+        comparison[col] = comparison[col].round(4)
+
+    return comparison, results1_df, results2_df
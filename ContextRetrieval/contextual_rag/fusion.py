@@ -0,0 +1,110 @@
+"""Score fusion and reranking steps shared by fusion_rank_search and the batched retrieval paths."""
+
+import numpy as np
+
+
+def fuse_scores(
+    bm25_scores: np.ndarray,
+    dense_scores: np.ndarray,
+    dense_indices: np.ndarray,
+    chunks: list[str],
+    weight_sparse: float,
+    k: int = 5,
+    reranker_cutoff: int = 20,
+) -> list[dict]:
+    """
+    Combine full BM25 scores with the dense top results exactly like fusion_rank_search.
+
+    Args:
+        bm25_scores: BM25 score of every chunk for the query
+        dense_scores: Similarity scores of the dense top results
+        dense_indices: Chunk indices of the dense top results
+        chunks: Chunk texts, indexed by chunk id
+        weight_sparse: Weight of the BM25 score (alpha)
+        k: Number of results to return
+        reranker_cutoff: Number of BM25 results to consider
+
+    Returns:
+        Results in the fusion_rank_search format
+    """
+    # Stable sort so tied scores (e.g. all the zeros) are ordered by the higher index, as in sharded retrieval
+    bm25_top_indices = np.argsort(bm25_scores, kind="stable")[::-1][:reranker_cutoff]
+    return fuse_top_scores(
+        bm25_top_indices, bm25_scores[bm25_top_indices], np.min(bm25_scores), np.max(bm25_scores),
+        dense_scores, dense_indices, chunks, weight_sparse, k,
+    )
+
+
+def fuse_top_scores(
+    bm25_top_indices: np.ndarray,
+    bm25_top_scores: np.ndarray,
+    bm25_min: float,
+    bm25_max: float,
+    dense_scores: np.ndarray,
+    dense_indices: np.ndarray,
+    chunks: list[str],
+    weight_sparse: float,
+    k: int = 5,
+) -> list[dict]:
+    """
+    Fusion from the BM25 top results plus the min/max over all BM25 scores, for
+    callers (e.g. sharded retrieval) that never materialise the full score array.
+    """
+    # Normalize scores
+    bm25_scores_norm = (bm25_top_scores - bm25_min) / (bm25_max - bm25_min)
+    dense_scores_norm = (dense_scores - np.min(dense_scores)) / (np.max(dense_scores) - np.min(dense_scores))
+
+    # Create combined results
+    combined_results = {}
+
+    # Add BM25 results
+    for idx, score in zip(bm25_top_indices, bm25_scores_norm):
+        combined_results[idx] = {'score': weight_sparse * score, 'count': 1}
+
+    # Add dense results
+    for idx, score in zip(dense_indices, dense_scores_norm):
+        if idx in combined_results:
+            combined_results[idx]['score'] += (1 - weight_sparse) * score
+            combined_results[idx]['count'] += 1
+        else:
+            combined_results[idx] = {'score': (1 - weight_sparse) * score, 'count': 1}
+
+    # Calculate final scores
+    for idx in combined_results:
+        combined_results[idx]['final_score'] = combined_results[idx]['score'] / combined_results[idx]['count']
+
+    # Sort by final score
+    sorted_results = sorted(combined_results.items(), key=lambda x: x[1]['final_score'], reverse=True)
+
+    # Return top k results with their chunks
+    final_results = []
+    for idx, scores in sorted_results[:k]:
+        final_results.append({
+            'id': str(idx),
+            'score': scores['final_score'],
+            'metadata': {'text': chunks[idx]}
+        })
+
+    return final_results
+
+
+def apply_rerank_scores(retrieved_results: list[dict], rerank_scores) -> list[dict]:
+    """Use reranker scores as the final score and resort, as evaluate_rag_system does."""
+    for result, rerank_score in zip(retrieved_results, rerank_scores):
+        result['metadata']['rerank_score'] = float(rerank_score)
+        result['score'] = float(rerank_score)
+    retrieved_results.sort(key=lambda x: x['score'], reverse=True)
+    return retrieved_results
+
+
+def rerank_batch(queries: list[str], results_per_query: list[list[dict]], get_reranker_score) -> list[list[dict]]:
+    """Rerank the results of several queries with a single reranker forward pass."""
+    pairs = [(query, result['metadata']['text']) for query, results in zip(queries, results_per_query) for result in results]
+    if not pairs:
+        return results_per_query
+    scores = get_reranker_score(pairs)
+    offset = 0
+    for results in results_per_query:
+        apply_rerank_scores(results, scores[offset:offset + len(results)])
+        offset += len(results)
+    return results_per_query
@@ -0,0 +1,180 @@
+"""Chunking, contextualization and index creation, ported from the notebook.
+
+langchain, rank_bm25, nltk and pinecone are imported on first use.
+"""
+
+from time import sleep
+from typing import Any, List, Optional
+
+from .splitting import MARKDOWN_SEPARATORS, OffsetTextSplitter, split_documents
+
+CONTEXT_SYSTEM_PROMPT = """You are an AI assistant specializing in document summarization and contextualization. Your task is to provide brief, relevant context for a specific chunk of text based on a larger document. Here's how to proceed:
+"""
+
+CONTEXT_HUMAN_PROMPT = """
+First, carefully read and analyze the following document:
+
+<document>
+{document}
+</document>
+
+Now, consider this specific chunk of text from the document:
+
+<chunk>
+{chunk}
+</chunk>
+
+Your goal is to provide a concise context for this chunk, situating it within the whole document. Follow these guidelines:
+
+1. Analyze how the chunk relates to the overall document's themes, arguments, or narrative.
+2. Identify the chunk's role or significance within the broader context of the document.
+3. Determine what information from the rest of the document is most relevant to understanding this chunk.
+
+Compose your response as follows:
+- Provide 3-4 sentences maximum of context.
+- Begin directly with the context, without any introductory phrases.
+- Use language like "Focuses on..." or "Addresses..." to describe the chunk's content.
+- Ensure the context would be helpful for improving search retrieval of the chunk.
+
+Important notes:
+- Do not use phrases like "this chunk" or "this section" in your response.
+- Do not repeat the chunk's content verbatim; provide context from the rest of the document.
+- Avoid unnecessary details; be succinct and relevant.
+- Do not include any additional commentary or meta-discussion about the task itself.
+
+ Remember, your goal is to provide clear, concise, and relevant context that situates the given chunk within the larger document.
+            """
+
+
+class Chunk:
+    def __init__(self, text: str, start: Optional[int] = None, end: Optional[int] = None):
+        self.text = text
+        self.context = None
+        self.start = start
+        self.end = end
+
+
+class ProcessedDocument:
+    def __init__(self, text: str, chunks: list[Chunk]):
+        self.text = text
+        self.chunks = chunks
+
+
+def process_documents(
+    texts: list[str],
+    chunk_size: int = 800,
+    chunk_overlap: int = 200,
+    separators: Optional[list[str]] = None,
+    max_workers: Optional[int] = None,
+) -> list[ProcessedDocument]:
+    """
+    Split the documents with split_documents, across all cores by default
+    (max_workers=1 splits in-process).
+    """
+    splitter = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators or MARKDOWN_SEPARATORS)
+    docs_processed = []
+    for text, spans in zip(texts, split_documents(texts, splitter, max_workers=max_workers)):
+        docs_processed.append(ProcessedDocument(text, [Chunk(span.text, span.start, span.end) for span in spans]))
+    return docs_processed
+
+
+def create_context_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", CONTEXT_SYSTEM_PROMPT),
+        ("human", CONTEXT_HUMAN_PROMPT),
+    ])
+
+
+def create_context_chain(llm):
+    return create_context_prompt() | llm
+
+
+def get_context(context_chain, text: str, chunk: str) -> str:
+    if len(chunk.strip()) <= 0 or len(text.strip()) <= 0:
+        raise Exception("Chunk or text is empty")
+    context = context_chain.invoke({"document": text, "chunk": chunk})
+    return context.content
+
+
+def generate_context(context_chain, docs_processed: list[ProcessedDocument]):
+    for i, doc in enumerate(docs_processed):
+        print(f'processing document index {i}')
+        for chunk in doc.chunks:
+            chunk.context = get_context(context_chain, text=doc.text, chunk=chunk.text)
+
+
+def contextualize_chunks(docs_processed: list[ProcessedDocument]) -> tuple[list[str], list[str]]:
+    """Regular chunk texts and f"{context} \\n\\n {chunk}" texts for the chunks that have a context."""
+    chunks_regular = []
+    chunks_with_context = []
+    for doc in docs_processed:
+        for chunk in doc.chunks:
+            chunks_regular.append(chunk.text)
+            if chunk.context:  # Only include chunks that have a context
+                chunks_with_context.append(f"{chunk.context} \n\n {chunk.text}")
+    return chunks_regular, chunks_with_context
+
+
+def create_bm25(chunks: list[str]):
+    from rank_bm25 import BM25Okapi
+
+    from .retrieval import word_tokenize
+    print("Creating BM25 model...")
+    tokenized_chunks = [word_tokenize(chunk) for chunk in chunks]
+    bm25 = BM25Okapi(tokenized_chunks)
+
+    return bm25
+
+
+def wait_for_index(pinecone, index_name):
+    while True:
+        desc = pinecone.describe_index(index_name)
+        if desc['ready']:
+            print("Index is ready!")
+            break
+        sleep(5)
+
+
+def create_pinecone_indexes(
+    pinecone,
+    embedding_model,
+    index_name: str,
+    chunks: list[str],
+    specs,
+    dimensions,
+    index_names: List[str],
+    embedding_index=None,
+) -> Any:
+    """
+    Args:
+        embedding_index: Existing index with a Pinecone-style upsert (e.g. QuantizedDenseIndex);
+            when given, pinecone, index_name, specs, dimensions and index_names are not used,
+            so with LocalEmbeddings no network access is needed
+    """
+    if embedding_index is None:
+        if index_name not in index_names:
+            pinecone.create_index(index_name, dimension=dimensions, metric="cosine", spec=specs)
+            wait_for_index(pinecone, index_name)
+
+        # Connect to Pinecone indexes
+        embedding_index = pinecone.Index(index_name)
+
+    # Semantic Embeddings using a Pre-trained Transformer Model
+    embeddings = embedding_model.embed_documents(chunks)
+    # Store embeddings in Pinecone
+    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        embedding_index.upsert([(str(i), embedding, {"text": chunk})])
+
+    print(f'len(embeddings)={len(embeddings)}, len(embeddings[0])={len(embeddings[0])}')
+    return embedding_index
+
+
+def create_local_index(embedding_model, chunks: list[str], **index_kwargs):
+    """Offline counterpart of create_pinecone_indexes, e.g. with LocalEmbeddings and no network access."""
+    from .quantized_index import QuantizedDenseIndex
+
+    return create_pinecone_indexes(
+        None, embedding_model, None, chunks, None, None, [],
+        embedding_index=QuantizedDenseIndex(**index_kwargs),
+    )
@@ -0,0 +1,137 @@
+"""Load test for MicroBatchingQueryService.
+
+Drives a service with a fixed number of concurrent clients and reports QPS and
+latency percentiles. Run as a script it builds a synthetic in-memory corpus
+with simulated embedding/reranker costs, so batching behaviour can be compared
+offline:
+
+    python -m contextual_rag.loadtest --requests 500 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from .query_service import MicroBatchingQueryService, ServiceOverloaded
+
+
+async def run_load_test(service: MicroBatchingQueryService, queries: list[str], n_requests: int, concurrency: int) -> dict:
+    latencies = []
+    batch_sizes = []
+    rejected = 0
+    next_request = 0
+
+    async def client():
+        nonlocal next_request, rejected
+        while next_request < n_requests:
+            query = queries[next_request % len(queries)]
+            next_request += 1
+            start = time.perf_counter()
+            try:
+                result = await service.query(query)
+            except ServiceOverloaded:
+                rejected += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            batch_sizes.append(result['batch_size'])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'rejected': rejected,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'qps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 2),
+        'mean_batch_size': round(float(np.mean(batch_sizes)), 2),
+    }
+
+
+class _SimulatedEmbeddings:
+    """Hash-seeded random vectors with a fixed per-call plus per-text cost, like a remote embedding API."""
+
+    def __init__(self, dimensions: int, call_ms: float, per_text_ms: float):
+        self.dimensions = dimensions
+        self.call_ms = call_ms
+        self.per_text_ms = per_text_ms
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        time.sleep((self.call_ms + self.per_text_ms * len(texts)) / 1000)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def _vector(self, text: str) -> list[float]:
+        vector = np.random.default_rng(abs(hash(text)) % (2 ** 32)).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+class _InMemoryIndex:
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def query(self, vector, top_k: int, **kwargs) -> dict:
+        scores = self.vectors @ np.asarray(vector)
+        top = np.argsort(scores)[::-1][:top_k]
+        return {'matches': [{'id': str(i), 'score': float(scores[i])} for i in top]}
+
+
+def _simulated_reranker(call_ms: float, per_pair_ms: float):
+    def get_reranker_score(pairs):
+        time.sleep((call_ms + per_pair_ms * len(pairs)) / 1000)
+        return np.array([len(text) % 17 for _, text in pairs], dtype=np.float32)
+    return get_reranker_score
+
+
+def build_synthetic_service(n_chunks: int = 5000, dimensions: int = 256, **service_kwargs) -> tuple[MicroBatchingQueryService, list[str]]:
+    from rank_bm25 import BM25Okapi
+
+    rng = random.Random(0)
+    vocabulary = [f"term{i}" for i in range(2000)]
+    chunks = [" ".join(rng.choices(vocabulary, k=120)) for _ in range(n_chunks)]
+    queries = [" ".join(rng.choices(vocabulary, k=8)) for _ in range(200)]
+
+    embedding_model = _SimulatedEmbeddings(dimensions, call_ms=30, per_text_ms=0.5)
+    vectors = np.array([embedding_model._vector(chunk) for chunk in chunks])
+    service = MicroBatchingQueryService(
+        bm25=BM25Okapi([chunk.split() for chunk in chunks]),
+        chunks=chunks,
+        embedding_model=embedding_model,
+        embedding_index=_InMemoryIndex(vectors),
+        get_reranker_score=_simulated_reranker(call_ms=20, per_pair_ms=0.5),
+        tokenize=str.split,
+        **service_kwargs,
+    )
+    return service, queries
+
+
+async def _main(args):
+    for max_batch_size in (1, args.max_batch_size):
+        service, queries = build_synthetic_service(
+            max_batch_size=max_batch_size,
+            max_wait_ms=args.max_wait_ms,
+            max_pending=args.max_pending,
+        )
+        async with service:
+            report = await run_load_test(service, queries, args.requests, args.concurrency)
+        print(f"max_batch_size={max_batch_size}: {report}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the micro-batching query service on a synthetic corpus")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-pending", type=int, default=256)
+    asyncio.run(_main(parser.parse_args()))
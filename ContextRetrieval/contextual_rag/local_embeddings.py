@@ -0,0 +1,202 @@
+"""Local CPU embedding backend.
+
+Drop-in replacement for OpenAIEmbeddings (embed_documents / embed_query) that
+runs a sentence-transformers model such as all-MiniLM-L6-v2 on CPU with no
+network access once the model files are cached. Texts are tokenized once,
+sorted by token length and grouped into dynamic batches capped by both
+`batch_size` and `max_tokens_per_batch` so little compute is spent on padding.
+Token embeddings are mean pooled over the attention mask and L2 normalised.
+Inference runs in PyTorch with a configurable thread count, or in an ONNX
+Runtime session when `onnx_path` is given.
+"""
+
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+DEFAULT_LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def length_sorted_batches(lengths: list[int], batch_size: int, max_tokens_per_batch: Optional[int] = None) -> list[list[int]]:
+    """
+    Group text indices into batches of similar token length.
+
+    A batch is closed when it reaches batch_size or when its padded size
+    (items * longest item) would exceed max_tokens_per_batch.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches = []
+    batch: list[int] = []
+    for i in order:
+        # Sorted descending, so the first item of a batch is its longest
+        padded_len = lengths[batch[0]] if batch else lengths[i]
+        too_many_tokens = max_tokens_per_batch is not None and batch and (len(batch) + 1) * padded_len > max_tokens_per_batch
+        if len(batch) == batch_size or too_many_tokens:
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def mean_pool(token_embeddings: np.ndarray, attention_mask: np.ndarray, normalize: bool = True) -> np.ndarray:
+    mask = attention_mask[..., None].astype(token_embeddings.dtype)
+    summed = (token_embeddings * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    pooled = summed / counts
+    if normalize:
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        pooled = pooled / np.clip(norms, 1e-12, None)
+    return pooled
+
+
+class LocalEmbeddings:
+    def __init__(
+        self,
+        model_name: str = DEFAULT_LOCAL_MODEL,
+        batch_size: int = 32,
+        max_tokens_per_batch: Optional[int] = 8192,
+        max_length: Optional[int] = None,
+        num_threads: Optional[int] = None,
+        onnx_path: Optional[str] = None,
+        normalize: bool = True,
+        sort_by_length: bool = True,
+        local_files_only: bool = False,
+    ):
+        """
+        Args:
+            model_name: Hugging Face model id or local directory
+            batch_size: Maximum texts per forward pass
+            max_tokens_per_batch: Maximum padded tokens per forward pass, None disables the cap
+            max_length: Truncation length, defaults to the tokenizer's model_max_length (capped at 512)
+            num_threads: Intra-op CPU threads for torch or ONNX Runtime, defaults to the library default
+            onnx_path: Path to an exported ONNX model, uses ONNX Runtime instead of torch
+            normalize: L2-normalise the pooled embeddings
+            sort_by_length: Group texts of similar length, disable to embed in input order
+            local_files_only: Never reach the network for model files (offline operation)
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.num_threads = num_threads
+        self.onnx_path = onnx_path
+        self.normalize = normalize
+        self.sort_by_length = sort_by_length
+        self.local_files_only = local_files_only
+        self._max_length = max_length
+        self._tokenizer = None
+        self._model = None
+        self._session = None
+        self._dimensions: Optional[int] = None
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name, local_files_only=self.local_files_only)
+        return self._tokenizer
+
+    @property
+    def embedding_ctx_length(self) -> int:
+        """Same attribute name as OpenAIEmbeddings, used for max_seq_length."""
+        if self._max_length is None:
+            self._max_length = min(self.tokenizer.model_max_length, 512)
+        return self._max_length
+
+    @property
+    def dimensions(self) -> int:
+        if self._dimensions is None:
+            self._dimensions = len(self.embed_query("dimension probe"))
+        return self._dimensions
+
+    def _load(self):
+        if self.onnx_path is not None:
+            if self._session is None:
+                import onnxruntime
+                options = onnxruntime.SessionOptions()
+                if self.num_threads:
+                    options.intra_op_num_threads = self.num_threads
+                self._session = onnxruntime.InferenceSession(self.onnx_path, options, providers=["CPUExecutionProvider"])
+            return
+        if self._model is None:
+            import torch
+            from transformers import AutoModel
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            self._model = AutoModel.from_pretrained(self.model_name, local_files_only=self.local_files_only)
+            self._model.eval()
+
+    def _forward(self, encoded: dict) -> np.ndarray:
+        if self._session is not None:
+            input_names = {model_input.name for model_input in self._session.get_inputs()}
+            feeds = {name: np.asarray(value, dtype=np.int64) for name, value in encoded.items() if name in input_names}
+            token_embeddings = self._session.run(None, feeds)[0]
+            return mean_pool(token_embeddings, np.asarray(encoded["attention_mask"]), self.normalize)
+
+        import torch
+        with torch.inference_mode():
+            inputs = {name: torch.as_tensor(value) for name, value in encoded.items()}
+            token_embeddings = self._model(**inputs).last_hidden_state.float().numpy()
+        return mean_pool(token_embeddings, np.asarray(encoded["attention_mask"]), self.normalize)
+
+    def embed_array(self, texts: list[str]) -> np.ndarray:
+        """Embed texts into a float32 array of shape (len(texts), dimensions), in input order."""
+        if not texts:
+            return np.zeros((0, self._dimensions or 0), dtype=np.float32)
+        self._load()
+        # Tokenize once without padding, then pad each batch to its own longest text
+        encodings = self.tokenizer(texts, truncation=True, max_length=self.embedding_ctx_length)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        if self.sort_by_length:
+            batches = length_sorted_batches(lengths, self.batch_size, self.max_tokens_per_batch)
+        else:
+            batches = [list(range(i, min(i + self.batch_size, len(texts)))) for i in range(0, len(texts), self.batch_size)]
+
+        output = None
+        for batch in batches:
+            features = [{key: encodings[key][i] for key in encodings.keys()} for i in batch]
+            encoded = self.tokenizer.pad(features, padding=True, return_tensors="np")
+            embeddings = self._forward(dict(encoded))
+            if output is None:
+                output = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+                self._dimensions = embeddings.shape[1]
+            output[batch] = embeddings
+        return output
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+def benchmark_embeddings(texts: list[str], models: dict, repeat: int = 1) -> list[dict]:
+    """
+    Embedding throughput on a corpus (e.g. chunks_regular) for each named model.
+
+    Args:
+        texts: Texts to embed
+        models: Name -> model with embed_documents, e.g. {'openai': OpenAIEmbeddings(...), 'local sorted': LocalEmbeddings()}
+        repeat: Runs per model, the fastest is reported
+    """
+    total_chars = sum(len(text) for text in texts)
+    reports = []
+    for name, model in models.items():
+        model.embed_documents(texts[:2])  # load weights / warm up outside the timed runs
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model.embed_documents(texts)
+            best = min(best, time.perf_counter() - start)
+        reports.append({
+            'model': name,
+            'texts': len(texts),
+            'seconds': round(best, 3),
+            'texts/s': round(len(texts) / best, 1),
+            'chars/s': round(total_chars / best, 1),
+            'threads': getattr(model, 'num_threads', None) or os.cpu_count(),
+        })
+    return reports
@@ -0,0 +1,100 @@
+"""Process pool that keeps the reranker and tokenizers loaded.
+
+Each worker loads the cross-encoder, its tokenizer and the nltk punkt tables
+once in the pool initializer, so requests never pay the multi-second model
+load. WarmModelPool.get_reranker_score has the same signature as
+get_reranker_score and can be passed to evaluate_rag_system,
+cascade_rank_search or MicroBatchingQueryService.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from .retrieval import RERANKER_MODEL, Reranker, word_tokenize
+
+_worker_reranker: Optional[Reranker] = None
+
+
+def _init_worker(model_name: str, num_threads: Optional[int]):
+    global _worker_reranker
+    word_tokenize("warm up")  # loads (and if needed downloads) the punkt tables
+    _worker_reranker = Reranker(model_name, num_threads=num_threads).load()
+    _worker_reranker.score([("warm up", "warm up")])
+
+
+def _worker_pid() -> int:
+    time.sleep(0.05)  # keep this worker busy so the next ping lands on another one
+    return os.getpid()
+
+
+def _worker_score(pairs) -> np.ndarray:
+    return _worker_reranker.score(pairs).numpy()
+
+
+def _worker_tokenize(texts: list[str]) -> list[list[str]]:
+    return [word_tokenize(text) for text in texts]
+
+
+class WarmModelPool:
+    def __init__(
+        self,
+        n_workers: int = 2,
+        reranker_model: str = RERANKER_MODEL,
+        threads_per_worker: Optional[int] = None,
+        warm: bool = True,
+        mp_context=None,
+    ):
+        """
+        Args:
+            n_workers: Worker processes, each holding its own copy of the reranker
+            reranker_model: Cross-encoder to preload
+            threads_per_worker: torch intra-op threads per worker, defaults to cpu_count // n_workers
+            warm: Start every worker and load the models before returning
+            mp_context: multiprocessing context, e.g. multiprocessing.get_context("spawn")
+        """
+        self.n_workers = n_workers
+        threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // n_workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(reranker_model, threads_per_worker),
+        )
+        self.warm_seconds: Optional[float] = None
+        if warm:
+            self.warm_up()
+
+    def warm_up(self, max_rounds: int = 10) -> float:
+        """Block until every worker has finished loading; returns the seconds it took."""
+        start = time.perf_counter()
+        pids: set[int] = set()
+        for _ in range(max_rounds):
+            futures = [self._executor.submit(_worker_pid) for _ in range(self.n_workers)]
+            pids.update(future.result() for future in futures)
+            if len(pids) >= self.n_workers:
+                break
+        self.warm_seconds = time.perf_counter() - start
+        return self.warm_seconds
+
+    def get_reranker_score(self, pairs) -> np.ndarray:
+        return self._executor.submit(_worker_score, list(pairs)).result()
+
+    def get_reranker_scores(self, batches: list) -> list[np.ndarray]:
+        """Score several independent pair lists in parallel across the workers."""
+        return list(self._executor.map(_worker_score, [list(pairs) for pairs in batches]))
+
+    def tokenize(self, texts: list[str]) -> list[list[str]]:
+        return self._executor.submit(_worker_tokenize, texts).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,229 @@
+"""Local dense index with compressed first-pass codes and full-precision rescoring.
+
+text-embedding-3-small vectors are 1536 float32 values (6 KB per chunk).
+QuantizedDenseIndex keeps a compressed copy for the first pass: optional
+Matryoshka truncation to the first `dimensions` values, then int8 (per-dimension
+scale) or binary (sign bit) quantization. The shortlist of
+`top_k * rescore_multiplier` candidates is rescored exactly with cosine
+similarity against the full vectors. The query() method returns Pinecone-style
+matches, so the index can be passed to fusion_rank_search as embedding_index.
+"""
+
+import time
+from typing import Optional
+
+import numpy as np
+
+QUANTIZATIONS = (None, "int8", "binary")
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values[..., None], axis=-1).sum(axis=-1)
+
+
+class QuantizedDenseIndex:
+    def __init__(
+        self,
+        dimensions: Optional[int] = None,
+        quantization: Optional[str] = "int8",
+        rescore_multiplier: int = 4,
+        block_size: int = 1024,
+    ):
+        """
+        Args:
+            dimensions: Leading dimensions kept for the first pass (Matryoshka truncation), None keeps all
+            quantization: None (float32), "int8" or "binary"
+            rescore_multiplier: Shortlist size as a multiple of top_k for exact rescoring
+            block_size: Rows scored at a time in the first pass, bounds temporary memory
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}, got {quantization!r}")
+        self.dimensions = dimensions
+        self.quantization = quantization
+        self.rescore_multiplier = rescore_multiplier
+        self.block_size = block_size
+        self.ids: list[str] = []
+        self.metadata: list[Optional[dict]] = []
+        # id -> row in full_vectors/codes, and rows written since the last build
+        self._rows: dict[str, int] = {}
+        self._pending: dict[int, np.ndarray] = {}
+        self.full_vectors = np.zeros((0, 0), dtype=np.float32)
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_embeddings(cls, embeddings, ids: Optional[list[str]] = None, **kwargs) -> "QuantizedDenseIndex":
+        index = cls(**kwargs)
+        ids = ids if ids is not None else [str(i) for i in range(len(embeddings))]
+        index.upsert(list(zip(ids, embeddings)))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, vectors: list[tuple]):
+        """
+        Insert (id, embedding) or (id, embedding, metadata) tuples. Like Pinecone's
+        upsert, an existing id has its vector and metadata overwritten.
+        """
+        for item in vectors:
+            vector_id = str(item[0])
+            row = self._rows.get(vector_id)
+            if row is None:
+                row = self._rows[vector_id] = len(self.ids)
+                self.ids.append(vector_id)
+                self.metadata.append(None)
+            self._pending[row] = np.asarray(item[1], dtype=np.float32)
+            self.metadata[row] = item[2] if len(item) > 2 else None
+        self.codes = None
+
+    def _build(self):
+        if self._pending:
+            rows = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+            new_vectors = _normalize_rows(np.stack(list(self._pending.values())).astype(np.float32))
+            full_vectors = np.empty((len(self.ids), new_vectors.shape[1]), dtype=np.float32)
+            if len(self.full_vectors):
+                full_vectors[:len(self.full_vectors)] = self.full_vectors
+            full_vectors[rows] = new_vectors
+            self.full_vectors = full_vectors
+            self._pending = {}
+
+        truncated = self._truncate(self.full_vectors)
+        if len(truncated) == 0:
+            self.scales = None
+            self.codes = truncated
+        elif self.quantization == "int8":
+            # Symmetric per-dimension scale, codes in [-127, 127]
+            self.scales = np.maximum(np.abs(truncated).max(axis=0), 1e-12) / 127
+            self.codes = np.clip(np.rint(truncated / self.scales), -127, 127).astype(np.int8)
+        elif self.quantization == "binary":
+            self.codes = np.packbits(truncated > 0, axis=1)
+        else:
+            self.codes = np.ascontiguousarray(truncated, dtype=np.float32)
+
+    def _truncate(self, vectors: np.ndarray) -> np.ndarray:
+        if self.dimensions is None or self.dimensions >= vectors.shape[-1]:
+            return vectors
+        return _normalize_rows(np.atleast_2d(vectors[..., :self.dimensions])).reshape(vectors.shape[:-1] + (self.dimensions,))
+
+    def _first_pass(self, query: np.ndarray) -> np.ndarray:
+        query = self._truncate(query)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        if self.quantization == "binary":
+            query_bits = np.packbits(query > 0)
+            for start in range(0, len(self.codes), self.block_size):
+                block = self.codes[start:start + self.block_size]
+                # Fewer differing sign bits means higher similarity
+                scores[start:start + len(block)] = -_popcount(np.bitwise_xor(block, query_bits)).sum(axis=1, dtype=np.int32)
+        elif self.quantization == "int8":
+            scaled_query = (query * self.scales).astype(np.float32)
+            for start in range(0, len(self.codes), self.block_size):
+                block = self.codes[start:start + self.block_size]
+                scores[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        else:
+            scores[:] = self.codes @ query
+        return scores
+
+    def query(self, vector, top_k: int = 10, include_values: bool = False, include_metadata: bool = False, **kwargs) -> dict:
+        if len(self.ids) == 0:
+            return {'matches': []}
+        if self.codes is None:
+            self._build()
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        scores = self._first_pass(query)
+        shortlist_size = min(len(scores), top_k * self.rescore_multiplier)
+        shortlist = np.argpartition(-scores, shortlist_size - 1)[:shortlist_size]
+
+        # Exact cosine similarity on the shortlist
+        exact_scores = self.full_vectors[shortlist] @ query
+        order = np.argsort(-exact_scores)[:top_k]
+
+        matches = []
+        for position in order:
+            row = shortlist[position]
+            match = {'id': self.ids[row], 'score': float(exact_scores[position])}
+            if include_values:
+                match['values'] = self.full_vectors[row].tolist()
+            if include_metadata and self.metadata[row] is not None:
+                match['metadata'] = self.metadata[row]
+            matches.append(match)
+        return {'matches': matches}
+
+    def offload_full_vectors(self, path: str):
+        """
+        Move the full-precision vectors to a memory-mapped file so only the
+        compressed codes stay resident; rescoring touches just the shortlist rows.
+        """
+        if self.codes is None:
+            self._build()
+        np.save(path, self.full_vectors)
+        self.full_vectors = np.load(path, mmap_mode="r")
+
+    def memory_per_chunk(self) -> dict:
+        if self.codes is None:
+            self._build()
+        n = max(len(self.ids), 1)
+        code_bytes = self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+        return {
+            'first_pass_bytes': code_bytes / n,
+            'full_vector_bytes': self.full_vectors.nbytes / n,
+            'full_vectors_resident': not isinstance(self.full_vectors, np.memmap),
+        }
+
+
+def evaluate_quantized_index(
+    embeddings,
+    query_embeddings,
+    configs: list[dict],
+    top_k: int = 20,
+) -> list[dict]:
+    """
+    Compare index configurations against exact full-precision search.
+
+    Args:
+        embeddings: Chunk embeddings, the same vectors stored in the Pinecone index
+        query_embeddings: Embeddings of the evaluation questions (best_answers_df['question'])
+        configs: QuantizedDenseIndex keyword arguments per configuration,
+            e.g. [{'dimensions': 512, 'quantization': 'int8'}, {'quantization': 'binary', 'rescore_multiplier': 10}]
+        top_k: Cutoff used for recall, reranker_cutoff in fusion_rank_search
+
+    Returns:
+        One report per configuration with memory per chunk, QPS and recall@top_k
+    """
+    exact = QuantizedDenseIndex.from_embeddings(embeddings, quantization=None)
+    exact_ids = [{match['id'] for match in exact.query(query, top_k)['matches']} for query in query_embeddings]
+
+    reports = []
+    for config in [{'quantization': None}] + list(configs):
+        index = QuantizedDenseIndex.from_embeddings(embeddings, **config)
+        index.query(query_embeddings[0], top_k)  # build codes outside the timed loop
+
+        start = time.perf_counter()
+        results = [index.query(query, top_k)['matches'] for query in query_embeddings]
+        elapsed = time.perf_counter() - start
+
+        recall = np.mean([
+            len(expected & {match['id'] for match in matches}) / len(expected)
+            for expected, matches in zip(exact_ids, results)
+        ])
+        memory = index.memory_per_chunk()
+        reports.append({
+            'dimensions': config.get('dimensions') or index.full_vectors.shape[1],
+            'quantization': config.get('quantization') or 'float32',
+            'rescore_multiplier': index.rescore_multiplier,
+            'first_pass_bytes_per_chunk': round(memory['first_pass_bytes'], 1),
+            'full_vector_bytes_per_chunk': round(memory['full_vector_bytes'], 1),
+            'qps': round(len(query_embeddings) / elapsed, 1),
+            f'recall@{top_k}': round(float(recall), 4),
+        })
+    return reports
@@ -0,0 +1,240 @@
+"""Micro-batching asyncio query service around fusion_rank_search.
+
+Concurrent requests arriving within `max_wait_ms` of each other (up to
+`max_batch_size`) are coalesced: their query embeddings come from one
+embed_documents call, BM25 scores from one batched scoring pass and reranker
+scores from one forward pass. Dense index lookups are issued concurrently and
+answers are generated per request. Results are then fanned back out to the
+awaiting callers.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+from .bm25 import BM25Postings
+from .fusion import fuse_scores, rerank_batch
+
+
+class ServiceOverloaded(Exception):
+    """Raised when a request is rejected by admission control."""
+
+
+class ServiceStopped(Exception):
+    """Raised for requests submitted to, or left unanswered by, a stopped service."""
+
+
+class _PendingQuery:
+    def __init__(self, query: str, future: asyncio.Future):
+        self.query = query
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatchingQueryService:
+    def __init__(
+        self,
+        bm25,
+        chunks: list[str],
+        embedding_model,
+        embedding_index,
+        get_reranker_score: Optional[Callable] = None,
+        generate_amswer: Optional[Callable[[str, str], str]] = None,
+        weight_sparse: float = 0.3,
+        k: int = 5,
+        reranker_cutoff: int = 20,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_pending: int = 256,
+        tokenize: Optional[Callable[[str], list[str]]] = None,
+        max_workers: int = 8,
+    ):
+        """
+        Args:
+            bm25: Fitted BM25Okapi (or BM25Postings) over chunks
+            chunks: Chunk texts, indexed by chunk id
+            embedding_model: Model with embed_documents, used to embed a batch of queries at once
+            embedding_index: Dense index with a Pinecone-style query(vector=, top_k=) method
+            get_reranker_score: Cross-encoder scoring function, skipped when None
+            generate_amswer: Answer generation function, skipped when None
+            weight_sparse: Weight of the BM25 score (alpha)
+            k: Number of results per query
+            reranker_cutoff: Number of results taken from each retrieval leg
+            max_batch_size: Maximum number of queries per batch
+            max_wait_ms: How long the first query of a batch waits for others
+            max_pending: Admission control, queries beyond this are rejected with ServiceOverloaded
+            tokenize: Query tokenizer, defaults to nltk's word_tokenize like create_bm25
+            max_workers: Threads used for dense lookups and generation, batches run on a separate pool
+        """
+        self.bm25 = bm25 if isinstance(bm25, BM25Postings) else BM25Postings.from_bm25(bm25)
+        self.chunks = chunks
+        self.embedding_model = embedding_model
+        self.embedding_index = embedding_index
+        self.get_reranker_score = get_reranker_score
+        self.generate_amswer = generate_amswer
+        self.weight_sparse = weight_sparse
+        self.k = k
+        self.reranker_cutoff = reranker_cutoff
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        if tokenize is None:
+            from .retrieval import word_tokenize
+            tokenize = word_tokenize
+        self.tokenize = tokenize
+        # Separate pools so a batch never waits on threads it is itself occupying
+        self._batch_executor = ThreadPoolExecutor(max_workers=2)
+        self._io_executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._batch_tasks: set[asyncio.Task] = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._pending = 0
+        self.batch_sizes: list[int] = []
+        self.rejected = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        """
+        Stop admitting queries, finish every query already submitted and shut
+        down the executors. Queries that still cannot be answered fail with ServiceStopped.
+        """
+        self._stopping = True
+        if self._worker is not None:
+            # The collector dispatches what is queued ahead of the sentinel, then exits
+            self._queue.put_nowait(None)
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while self._batch_tasks:
+            await asyncio.gather(*list(self._batch_tasks), return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                pending = self._queue.get_nowait()
+                if pending is not None and not pending.future.done():
+                    pending.future.set_exception(ServiceStopped("Service stopped before the query was processed"))
+        self._batch_executor.shutdown(wait=True)
+        self._io_executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def query(self, query: str) -> dict:
+        """Submit a query and wait for its results (and answer, if generation is enabled)."""
+        if self._queue is None:
+            raise RuntimeError("Service is not started")
+        if self._stopping:
+            raise ServiceStopped("Service is stopping, no new queries are accepted")
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceOverloaded(f"{self._pending} queries pending, limit is {self.max_pending}")
+        self._pending += 1
+        pending = _PendingQuery(query, asyncio.get_running_loop().create_future())
+        try:
+            self._queue.put_nowait(pending)
+            return await pending.future
+        finally:
+            self._pending -= 1
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if pending is None:
+                    # stop() was called, dispatch this last batch without waiting
+                    stopping = True
+                    break
+                batch.append(pending)
+            self.batch_sizes.append(len(batch))
+            # Process the batch without blocking collection of the next one
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: list[_PendingQuery]):
+        loop = asyncio.get_running_loop()
+        queries = [pending.query for pending in batch]
+        try:
+            results_per_query = await loop.run_in_executor(self._batch_executor, self._retrieve_batch, queries)
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        async def finish(pending: _PendingQuery, retrieved_results: list[dict]):
+            try:
+                answer = None
+                if self.generate_amswer is not None:
+                    context = "\n".join([res['metadata']['text'] for res in retrieved_results])
+                    answer = await loop.run_in_executor(self._io_executor, self.generate_amswer, context, pending.query)
+                if not pending.future.done():
+                    pending.future.set_result({
+                        'query': pending.query,
+                        'results': retrieved_results,
+                        'answer': answer,
+                        'batch_size': len(batch),
+                        'latency': time.perf_counter() - pending.enqueued_at,
+                    })
+            except Exception as e:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+
+        await asyncio.gather(*(finish(pending, results) for pending, results in zip(batch, results_per_query)))
+
+    def _retrieve_batch(self, queries: list[str]) -> list[list[dict]]:
+        # One embedding request and one BM25 pass for the whole batch
+        query_embeddings = self.embedding_model.embed_documents(queries)
+        bm25_scores = self.bm25.get_batch_scores([self.tokenize(query) for query in queries])
+
+        def dense_query(query_embedding):
+            return self.embedding_index.query(vector=query_embedding, top_k=self.reranker_cutoff, include_values=False)
+
+        dense_results = list(self._io_executor.map(dense_query, query_embeddings)) if len(queries) > 1 else [dense_query(query_embeddings[0])]
+
+        results_per_query = []
+        for row, dense in enumerate(dense_results):
+            dense_scores = np.array([match['score'] for match in dense['matches']])
+            dense_indices = np.array([int(match['id']) for match in dense['matches']])
+            results_per_query.append(fuse_scores(
+                bm25_scores[row], dense_scores, dense_indices, self.chunks,
+                weight_sparse=self.weight_sparse, k=self.k, reranker_cutoff=self.reranker_cutoff,
+            ))
+
+        # One reranker forward pass over every (query, chunk) pair in the batch
+        if self.get_reranker_score is not None:
+            rerank_batch(queries, results_per_query, self.get_reranker_score)
+        return results_per_query
+
+    def stats(self) -> dict:
+        return {
+            'batches': len(self.batch_sizes),
+            'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            'max_batch_size': max(self.batch_sizes, default=0),
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,117 @@
+"""Fusion retrieval and reranking, ported from the notebook.
+
+torch/transformers are only imported when the reranker is first used and nltk
+only when a query is tokenized, so importing fusion_rank_search is cheap. The
+punkt tables the notebook fetched with nltk.download('punkt_tab') are
+downloaded on the first tokenization if they are missing.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from .fusion import apply_rerank_scores, fuse_scores
+
+RERANKER_MODEL = 'BAAI/bge-reranker-v2-m3'
+
+
+_punkt_available = False
+
+
+def ensure_punkt():
+    """Download nltk's punkt_tab tables unless they are already installed."""
+    global _punkt_available
+    if _punkt_available:
+        return
+    import nltk
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        if not nltk.download('punkt_tab', quiet=True):
+            raise LookupError("nltk punkt_tab tables are missing and could not be downloaded, run nltk.download('punkt_tab')")
+    _punkt_available = True
+
+
+def word_tokenize(text: str) -> list[str]:
+    import nltk
+    ensure_punkt()
+    return nltk.word_tokenize(text)
+
+
+class Reranker:
+    def __init__(self, model_name: str = RERANKER_MODEL, max_length: int = 512, num_threads: Optional[int] = None):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.num_threads = num_threads
+        self.tokenizer = None
+        self.model = None
+
+    def load(self) -> "Reranker":
+        if self.model is None:
+            import torch
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+            self.model.eval()
+        return self
+
+    def score(self, pairs):
+        import torch
+        self.load()
+        with torch.no_grad():
+            inputs = self.tokenizer(pairs, padding=True, truncation=True, return_tensors='pt', max_length=self.max_length)
+            scores = self.model(**inputs, return_dict=True).logits.view(-1, ).float()
+            return scores
+
+
+_default_reranker: Optional[Reranker] = None
+
+
+def get_reranker(model_name: str = RERANKER_MODEL) -> Reranker:
+    global _default_reranker
+    if _default_reranker is None or _default_reranker.model_name != model_name:
+        _default_reranker = Reranker(model_name)
+    return _default_reranker
+
+
+def get_reranker_score(pairs):
+    return get_reranker().score(pairs)
+
+
+def fusion_rank_search(
+    query: str,
+    bm25,
+    chunks: list[str],
+    model,
+    embedding_index,
+    weight_sparse: float,
+    k: int = 5,
+    reranker_cutoff: int = 20  # Number of top results to rerank
+):
+    # Get BM25 results
+    tokenized_query = word_tokenize(query)
+    bm25_scores = np.array(bm25.get_scores(tokenized_query))
+
+    # Get dense results
+    query_embedding = model.embed_query(query)
+
+    # Query the dense index
+    dense_results = embedding_index.query(
+        vector=query_embedding,
+        top_k=reranker_cutoff,
+        include_values=True
+    )
+
+    # Extract scores and indices from the dense results and convert to numpy arrays
+    dense_scores = np.array([match['score'] for match in dense_results['matches']])
+    dense_indices = np.array([int(match['id']) for match in dense_results['matches']])
+
+    return fuse_scores(bm25_scores, dense_scores, dense_indices, chunks, weight_sparse, k, reranker_cutoff)
+
+
+def rerank_results(query: str, retrieved_results: list[dict], get_reranker_score=get_reranker_score) -> list[dict]:
+    """Score results with the cross-encoder and sort by reranker score."""
+    pairs = [(query, result['metadata']['text']) for result in retrieved_results]
+    return apply_rerank_scores(retrieved_results, get_reranker_score(pairs))
@@ -0,0 +1,229 @@
+"""Sharded multi-process retrieval with shared-memory indexes.
+
+The chunk corpus is split into contiguous shards, one worker process per shard.
+Each shard's BM25 postings and dense vectors live in shared memory, so workers
+attach to them without copying. The coordinator scatters every query to all
+shards, each shard returns its BM25 and dense top-k, and the coordinator merges
+them before fusion.
+
+BM25 statistics (IDF, average document length) come from the BM25Okapi fitted
+on the whole corpus. Every posting stores its precomputed term weight
+idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) using those global
+values, so shard scores are identical to BM25Okapi.get_scores on the full corpus.
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Callable, Optional
+
+import numpy as np
+
+from .fusion import fuse_top_scores
+
+
+def _to_shared(array: np.ndarray) -> tuple[shared_memory.SharedMemory, tuple]:
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(spec: tuple) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    # Highest score first, ties broken by the higher index like argsort(...)[::-1]
+    if len(scores) > k:
+        candidates = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((-candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def _shard_worker(conn, specs: dict, doc_offset: int):
+    handles = {}
+    arrays = {}
+    for key, spec in specs.items():
+        handles[key], arrays[key] = _attach(spec)
+    term_offsets, doc_ids, weights, vectors = arrays['term_offsets'], arrays['doc_ids'], arrays['weights'], arrays['vectors']
+    n_docs = len(vectors)
+    try:
+        while True:
+            batch = conn.recv()
+            if batch is None:
+                break
+            replies = []
+            for term_ids, query_vector, top_k in batch:
+                bm25_scores = np.zeros(n_docs)
+                for term_id in term_ids:
+                    start, end = term_offsets[term_id], term_offsets[term_id + 1]
+                    bm25_scores[doc_ids[start:end]] += weights[start:end]
+                bm25_top = _top_k(bm25_scores, top_k)
+                reply = {
+                    'bm25_indices': bm25_top + doc_offset,
+                    'bm25_scores': bm25_scores[bm25_top],
+                    'bm25_min': float(bm25_scores.min()) if n_docs else np.inf,
+                    'bm25_max': float(bm25_scores.max()) if n_docs else -np.inf,
+                }
+                if query_vector is not None:
+                    dense_scores = vectors @ query_vector
+                    dense_top = _top_k(dense_scores, top_k)
+                    reply['dense_indices'] = dense_top + doc_offset
+                    reply['dense_scores'] = dense_scores[dense_top]
+                replies.append(reply)
+            conn.send(replies)
+    finally:
+        del arrays, term_offsets, doc_ids, weights, vectors
+        for handle in handles.values():
+            handle.close()
+
+
+class ShardedRetriever:
+    def __init__(
+        self,
+        bm25,
+        chunks: list[str],
+        embeddings,
+        n_shards: int = 4,
+        tokenize: Optional[Callable[[str], list[str]]] = None,
+        mp_context: Optional[str] = None,
+    ):
+        """
+        Args:
+            bm25: BM25Okapi fitted on the whole chunk corpus, source of the global IDF and avgdl
+            chunks: Chunk texts, indexed by chunk id
+            embeddings: Chunk embeddings in chunk order (the vectors upserted to the dense index)
+            n_shards: Number of worker processes
+            tokenize: Query tokenizer, defaults to nltk's word_tokenize like create_bm25
+            mp_context: multiprocessing start method, defaults to the platform default
+        """
+        if tokenize is None:
+            from .retrieval import word_tokenize
+            tokenize = word_tokenize
+        self.tokenize = tokenize
+        self.chunks = chunks
+        self.n_shards = n_shards
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        # Global term ids, so workers only ever see integers
+        self.term_ids: dict[str, int] = {term: i for i, term in enumerate(bm25.idf)}
+        doc_len = np.asarray(bm25.doc_len, dtype=np.float64)
+        norm = bm25.k1 * (1 - bm25.b + bm25.b * doc_len / bm25.avgdl)
+
+        self._shms: list[shared_memory.SharedMemory] = []
+        self._connections = []
+        self._processes = []
+        context = multiprocessing.get_context(mp_context)
+        bounds = np.linspace(0, len(chunks), n_shards + 1).astype(int)
+        for shard in range(n_shards):
+            start, end = bounds[shard], bounds[shard + 1]
+            specs = self._build_shard(bm25, norm, vectors, start, end)
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_shard_worker, args=(child_conn, specs, int(start)), daemon=True)
+            process.start()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+
+    def _build_shard(self, bm25, norm: np.ndarray, vectors: np.ndarray, start: int, end: int) -> dict:
+        term_doc_ids: list[list[int]] = [[] for _ in self.term_ids]
+        term_weights: list[list[float]] = [[] for _ in self.term_ids]
+        k1 = bm25.k1
+        for doc_idx in range(start, end):
+            for term, freq in bm25.doc_freqs[doc_idx].items():
+                term_id = self.term_ids[term]
+                term_doc_ids[term_id].append(doc_idx - start)
+                # Same expression as BM25Okapi.get_scores, with the global idf and avgdl
+                term_weights[term_id].append(bm25.idf[term] * (freq * (k1 + 1) / (freq + norm[doc_idx])))
+
+        term_offsets = np.zeros(len(self.term_ids) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(ids) for ids in term_doc_ids])
+        arrays = {
+            'term_offsets': term_offsets,
+            'doc_ids': np.fromiter((i for ids in term_doc_ids for i in ids), dtype=np.int32, count=int(term_offsets[-1])),
+            'weights': np.fromiter((w for ws in term_weights for w in ws), dtype=np.float64, count=int(term_offsets[-1])),
+            'vectors': vectors[start:end],
+        }
+        specs = {}
+        for key, array in arrays.items():
+            shm, specs[key] = _to_shared(array)
+            self._shms.append(shm)
+        return specs
+
+    def _scatter_gather(self, requests: list[tuple]) -> list[list[dict]]:
+        for conn in self._connections:
+            conn.send(requests)
+        return [conn.recv() for conn in self._connections]
+
+    def search_batch(
+        self,
+        queries: list[str],
+        query_embeddings,
+        weight_sparse: float,
+        k: int = 5,
+        reranker_cutoff: int = 20,
+    ) -> list[list[dict]]:
+        """fusion_rank_search for a batch of queries, results in the same format."""
+        requests = []
+        for query, query_embedding in zip(queries, query_embeddings):
+            term_ids = [self.term_ids[token] for token in self.tokenize(query) if token in self.term_ids]
+            vector = np.asarray(query_embedding, dtype=np.float32)
+            vector = vector / (np.linalg.norm(vector) or 1)
+            requests.append((term_ids, vector, reranker_cutoff))
+        shard_replies = self._scatter_gather(requests)
+
+        results = []
+        for position in range(len(queries)):
+            replies = [replies[position] for replies in shard_replies]
+            bm25_indices = np.concatenate([reply['bm25_indices'] for reply in replies])
+            bm25_scores = np.concatenate([reply['bm25_scores'] for reply in replies])
+            bm25_order = np.lexsort((-bm25_indices, -bm25_scores))[:reranker_cutoff]
+            dense_indices = np.concatenate([reply['dense_indices'] for reply in replies])
+            dense_scores = np.concatenate([reply['dense_scores'] for reply in replies])
+            dense_order = np.lexsort((-dense_indices, -dense_scores))[:reranker_cutoff]
+            results.append(fuse_top_scores(
+                bm25_indices[bm25_order], bm25_scores[bm25_order],
+                min(reply['bm25_min'] for reply in replies), max(reply['bm25_max'] for reply in replies),
+                dense_scores[dense_order], dense_indices[dense_order],
+                self.chunks, weight_sparse, k,
+            ))
+        return results
+
+    def search(self, query: str, model, weight_sparse: float, k: int = 5, reranker_cutoff: int = 20) -> list[dict]:
+        """Drop-in for fusion_rank_search(query, bm25, chunks, model, embedding_index, ...)."""
+        return self.search_batch([query], [model.embed_query(query)], weight_sparse, k, reranker_cutoff)[0]
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        """Full BM25 score vector gathered from all shards, for checking against BM25Okapi.get_scores."""
+        term_ids = [self.term_ids[token] for token in self.tokenize(query) if token in self.term_ids]
+        replies = self._scatter_gather([(term_ids, None, len(self.chunks))])
+        scores = np.zeros(len(self.chunks))
+        for shard_reply in replies:
+            reply = shard_reply[0]
+            scores[reply['bm25_indices']] = reply['bm25_scores']
+        return scores
+
+    def close(self):
+        for conn in self._connections:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._connections, self._processes, self._shms = [], [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
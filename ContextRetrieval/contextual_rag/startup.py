@@ -0,0 +1,81 @@
+"""Import-time and cold-start measurements.
+
+Compares importing the notebook's eager dependency set with importing the
+retrieval entry point from this package, each in a fresh interpreter, and the
+first reranker call in a cold process with a call served by a WarmModelPool.
+
+    python -m contextual_rag.startup
+"""
+
+import json
+import subprocess
+import sys
+import time
+
+# Top-level imports of notebook/contextual_retrieval.py
+NOTEBOOK_IMPORTS = [
+    "numpy", "nltk", "rank_bm25", "sklearn.metrics.pairwise", "datasets",
+    "langchain.text_splitter", "langchain_core.prompts", "pinecone", "pandas",
+    "torch", "transformers", "bert_score", "langchain_openai",
+]
+
+_TIMER = """
+import importlib, json, sys, time
+missing = []
+start = time.perf_counter()
+for name in {modules!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        missing.append(name)
+print(json.dumps({{'seconds': time.perf_counter() - start, 'missing': missing}}))
+"""
+
+
+def measure_import(modules: list[str], python: str = sys.executable) -> dict:
+    output = subprocess.run([python, "-c", _TIMER.format(modules=modules)], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def measure_statement(statement: str, python: str = sys.executable) -> float:
+    code = f"import time\nstart = time.perf_counter()\n{statement}\nprint(time.perf_counter() - start)"
+    output = subprocess.run([python, "-c", code], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def measure_import_times() -> dict:
+    before = measure_import(NOTEBOOK_IMPORTS)
+    return {
+        'notebook_imports_seconds': round(before['seconds'], 3),
+        'notebook_imports_missing': before['missing'],
+        'fusion_rank_search_import_seconds': round(measure_statement("from contextual_rag import fusion_rank_search"), 3),
+    }
+
+
+def measure_cold_start(pairs=None, n_workers: int = 1) -> dict:
+    """First reranker call in a fresh process versus a call on an already warm pool."""
+    from .model_pool import WarmModelPool
+
+    pairs = pairs or [("How do I convert weights to safetensors?", "Use the Convert Space to convert .bin weights.")]
+    cold = measure_statement(
+        "from contextual_rag import get_reranker_score\n"
+        f"get_reranker_score({pairs!r})"
+    )
+    with WarmModelPool(n_workers=n_workers) as pool:
+        start = time.perf_counter()
+        pool.get_reranker_score(pairs)
+        warm = time.perf_counter() - start
+        warm_up = pool.warm_seconds
+    return {
+        'cold_first_call_seconds': round(cold, 3),
+        'pool_warm_up_seconds': round(warm_up, 3),
+        'warm_call_seconds': round(warm, 4),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(measure_import_times(), indent=2))
+    try:
+        print(json.dumps(measure_cold_start(), indent=2))
+    except Exception as e:  # torch/transformers missing or the model cannot be downloaded
+        print(f"Skipping cold-start measurement: {e}")
@@ -0,0 +1,149 @@
+"""Streaming answer generation with time-to-first-token tracking.
+
+Streaming counterpart of get_generate_amswer: the answer chain built by
+create_answer_chain is consumed with `.stream()` so tokens reach the user as
+soon as they are produced. Any chat model that implements streaming works,
+including langchain_core's GenericFakeChatModel for local testing.
+"""
+
+import time
+from typing import Callable, Iterator, Optional
+
+
+class StreamMetrics:
+    def __init__(self):
+        # Set when the stream is first iterated, not when it is created
+        self.request_start: Optional[float] = None
+        self.generation_start: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.end: Optional[float] = None
+        self.tokens = 0
+        self.retrieval_seconds = 0.0
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """Seconds from the start of the request to the first streamed token."""
+        if self.first_token_at is None or self.request_start is None:
+            return None
+        return self.first_token_at - self.request_start
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Decode rate after the first token."""
+        if self.first_token_at is None or self.end is None or self.tokens < 2:
+            return None
+        elapsed = self.end - self.first_token_at
+        return (self.tokens - 1) / elapsed if elapsed > 0 else None
+
+    def as_dict(self) -> dict:
+        return {
+            'retrieval_seconds': self.retrieval_seconds,
+            'time_to_first_token': self.time_to_first_token,
+            'tokens': self.tokens,
+            'tokens_per_second': self.tokens_per_second,
+            'total_seconds': (self.end - self.request_start) if self.end is not None and self.request_start is not None else None,
+        }
+
+
+class AnswerStream:
+    """Iterator over answer tokens; the request's StreamMetrics stay reachable as `.metrics`."""
+
+    def __init__(self, tokens: Iterator[str], metrics: StreamMetrics):
+        self._tokens = tokens
+        self.metrics = metrics
+
+    def __iter__(self) -> "AnswerStream":
+        return self
+
+    def __next__(self) -> str:
+        return next(self._tokens)
+
+    def close(self):
+        self._tokens.close()
+
+
+def get_stream_answer(llm_chain):
+    """
+    Streaming version of get_generate_amswer.
+
+    The returned function returns an AnswerStream that yields answer tokens as
+    they arrive and records them in its `metrics` (the object passed in, or a new one).
+    """
+    def stream_answer(context, query, metrics: Optional[StreamMetrics] = None) -> AnswerStream:
+        metrics = metrics if metrics is not None else StreamMetrics()
+        return AnswerStream(_stream_tokens(llm_chain, context, query, metrics), metrics)
+    return stream_answer
+
+
+def _stream_tokens(llm_chain, context, query, metrics: StreamMetrics) -> Iterator[str]:
+    metrics.generation_start = time.perf_counter()
+    if metrics.request_start is None:
+        # Called directly rather than through stream_rag_answer: the request starts with generation
+        metrics.request_start = metrics.generation_start
+    try:
+        for chunk in llm_chain.stream({"context": context, "query": query}):
+            token = chunk.content if hasattr(chunk, 'content') else chunk
+            if not token:
+                continue
+            if metrics.first_token_at is None:
+                metrics.first_token_at = time.perf_counter()
+            metrics.tokens += 1
+            yield token
+    finally:
+        metrics.end = time.perf_counter()
+
+
+def stream_rag_answer(
+    query: str,
+    retrieve: Callable[[str], list[dict]],
+    stream_answer,
+    build_context: Optional[Callable[[list[dict]], str]] = None,
+    metrics: Optional[StreamMetrics] = None,
+) -> AnswerStream:
+    """
+    Run retrieval and reranking, then start streaming the answer immediately.
+
+    Args:
+        query: User question
+        retrieve: Returns the reranked results for the query (fusion_rank_search + get_reranker_score)
+        stream_answer: Function returned by get_stream_answer
+        build_context: Turns results into the prompt context, defaults to the newline join used by evaluate_rag_system
+        metrics: Optional StreamMetrics to record timings into, also available as `.metrics` on the stream
+    """
+    metrics = metrics if metrics is not None else StreamMetrics()
+    return AnswerStream(_stream_rag_tokens(query, retrieve, stream_answer, build_context, metrics), metrics)
+
+
+def _stream_rag_tokens(query, retrieve, stream_answer, build_context, metrics: StreamMetrics) -> Iterator[str]:
+    metrics.request_start = time.perf_counter()
+    retrieved_results = retrieve(query)
+    if build_context is None:
+        context = "\n".join([res['metadata']['text'] for res in retrieved_results])
+    else:
+        context = build_context(retrieved_results)
+    metrics.retrieval_seconds = time.perf_counter() - metrics.request_start
+    yield from stream_answer(context, query, metrics)
+
+
+def collect_stream(stream: Iterator[str], on_token: Optional[Callable[[str], None]] = None) -> str:
+    """Drain a token stream into the full answer, optionally echoing each token."""
+    tokens = []
+    for token in stream:
+        if on_token is not None:
+            on_token(token)
+        tokens.append(token)
+    return "".join(tokens)
+
+
+def summarize_stream_metrics(metrics: list[StreamMetrics]) -> dict:
+    ttfts = sorted(m.time_to_first_token for m in metrics if m.time_to_first_token is not None)
+    rates = [m.tokens_per_second for m in metrics if m.tokens_per_second is not None]
+    if not ttfts:
+        return {'requests': len(metrics)}
+    return {
+        'requests': len(metrics),
+        'ttft_mean': sum(ttfts) / len(ttfts),
+        'ttft_p50': ttfts[len(ttfts) // 2],
+        'ttft_p95': ttfts[min(len(ttfts) - 1, int(0.95 * len(ttfts)))],
+        'tokens_per_second_mean': sum(rates) / len(rates) if rates else None,
+    }
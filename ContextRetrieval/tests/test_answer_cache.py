@@ -0,0 +1,85 @@
+import numpy as np
+
+from contextual_rag.answer_cache import CachedQueryEmbeddings, SemanticAnswerCache, get_cached_answer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def unit(*values) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_threshold_separates_hits_from_misses():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    cache.put("convert weights", unit(1, 0, 0), "answer", latency=2.0)
+
+    assert cache.lookup(unit(1, 0.1, 0)).answer == "answer"  # cosine ~0.995
+    assert cache.lookup(unit(1, 1, 0)) is None  # cosine ~0.707
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'latency_saved_seconds': 2.0}
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = SemanticAnswerCache(ttl_seconds=10, clock=clock)
+    cache.put("first", unit(1, 0, 0), "old")
+    clock.now = 5
+    cache.put("second", unit(0, 1, 0), "new")
+
+    clock.now = 12
+    assert cache.lookup(unit(1, 0, 0)) is None
+    assert cache.lookup(unit(0, 1, 0)).answer == "new"
+    assert len(cache) == 1
+
+
+def test_least_recently_used_entry_is_evicted_and_its_row_reused():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.put("a", unit(1, 0, 0), "A")
+    cache.put("b", unit(0, 1, 0), "B")
+    matrix = cache._matrix
+    cache.lookup(unit(1, 0, 0))  # "a" is now the most recently used
+    cache.put("c", unit(0, 0, 1), "C")
+
+    assert cache.lookup(unit(0, 1, 0)) is None
+    assert cache.lookup(unit(1, 0, 0)).answer == "A"
+    assert cache.lookup(unit(0, 0, 1)).answer == "C"
+    # Embeddings are written in place into the preallocated matrix
+    assert cache._matrix is matrix and cache._rows_used == 2
+
+
+def test_index_version_change_drops_cached_answers():
+    cache = SemanticAnswerCache(index_version="v1")
+    cache.put("a", unit(1, 0, 0), "A")
+
+    assert cache.lookup(unit(1, 0, 0), index_version="v1").answer == "A"
+    assert cache.lookup(unit(1, 0, 0), index_version="v2") is None
+    assert len(cache) == 0
+
+
+def test_get_cached_answer_embeds_once_and_serves_paraphrases():
+    class Embeddings:
+        calls = 0
+
+        def embed_query(self, text):
+            self.calls += 1
+            return [1.0, 0.0] if "weights" in text else [0.0, 1.0]
+
+    model = CachedQueryEmbeddings(Embeddings())
+    cache = SemanticAnswerCache()
+    answered = []
+
+    def answer_query(query):
+        model.embed_query(query)  # fusion_rank_search reuses the cached embedding
+        answered.append(query)
+        return f"answer to {query}"
+
+    assert get_cached_answer("convert weights", model, answer_query, cache) == ("answer to convert weights", False)
+    assert get_cached_answer("how to convert weights", model, answer_query, cache) == ("answer to convert weights", True)
+    assert answered == ["convert weights"]
+    assert model.model.calls == 2
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+torch = pytest.importorskip("torch")
+bert_score = pytest.importorskip("bert_score")
+transformers = pytest.importorskip("transformers")
+
+from contextual_rag.bertscore_stage import BERTScoreStage
+
+WORDS = [f"w{i}" for i in range(200)]
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory) -> str:
+    # Randomly initialised BERT saved locally, so no model download is needed
+    path = tmp_path_factory.mktemp("tiny-bert")
+    (path / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    transformers.BertTokenizer(str(path / "vocab.txt"), model_max_length=512).save_pretrained(str(path))
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(WORDS) + 5, hidden_size=64, num_hidden_layers=2, num_attention_heads=2, intermediate_size=128,
+    )
+    transformers.BertModel(config).save_pretrained(str(path))
+    return str(path)
+
+
+def sentences(seed: int, n: int) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 60))) for _ in range(n)]
+
+
+def assert_matches_bert_score(scores, cands, refs, model):
+    expected = bert_score.score(cands, refs, model_type=model, num_layers=2, device="cpu")
+    for values, expected_values in zip(scores, expected):
+        assert float((values - expected_values).abs().max()) <= 1e-5
+
+
+def test_stage_matches_bert_score_across_configurations(tiny_model):
+    refs = sentences(0, 40)
+    stage = BERTScoreStage(model_type=tiny_model, num_layers=2, device="cpu", batch_size=8)
+    for seed in (1, 2):
+        cands = sentences(seed, 40)
+        assert_matches_bert_score(stage.score(cands, refs), cands, refs, tiny_model)
+    # The second configuration reuses every cached reference embedding
+    assert stage.cache_hits >= len(refs)
+
+
+def test_incremental_scoring_and_disk_cache(tiny_model, tmp_path):
+    refs, cands = sentences(3, 30), sentences(4, 30)
+    cache_path = str(tmp_path / "bertscore.pt")
+
+    stage = BERTScoreStage(model_type=tiny_model, num_layers=2, device="cpu", batch_size=8, cache_path=cache_path)
+    stage.start(refs)
+    for cand, ref in zip(cands, refs):
+        stage.add(cand, ref)
+    assert_matches_bert_score(stage.finish(), cands, refs, tiny_model)
+
+    reloaded = BERTScoreStage(model_type=tiny_model, num_layers=2, device="cpu", cache_path=cache_path)
+    assert_matches_bert_score(reloaded.score(cands, refs), cands, refs, tiny_model)
+    assert reloaded.cache_misses == 0
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from contextual_rag.cascade import CascadeThresholds, _smallest_safe_threshold, _top_margin, cascade_rank_search
+
+
+class FixedBM25:
+    def __init__(self, scores):
+        self.scores = np.asarray(scores, dtype=float)
+
+    def get_scores(self, tokenized_query):
+        return self.scores
+
+
+class UnusedDense:
+    def embed_query(self, query):
+        raise AssertionError("the dense leg should have been skipped")
+
+    def query(self, **kwargs):
+        raise AssertionError("the dense leg should have been skipped")
+
+
+def test_threshold_is_not_placed_inside_a_tie_group():
+    margins = [0.9, 0.8, 0.7, 0.6, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+    agrees = [True] * 5 + [False] * 5
+    # Admitting 0.0 admits all six tied queries, only 50% of which agree
+    assert _smallest_safe_threshold(margins, agrees, min_agreement=0.95, min_support=3) == 0.6
+
+
+def test_whole_tie_group_can_be_admitted():
+    margins = [0.5, 0.5, 0.5, 0.2, 0.2]
+    assert _smallest_safe_threshold(margins, [True] * 5, min_agreement=0.95, min_support=3) == 0.2
+    # Three agreeing queries at 0.5, but min_support needs four
+    assert _smallest_safe_threshold(margins, [True, True, True, False, False], 0.95, 4) == float("inf")
+
+
+def test_queries_without_bm25_match_are_never_decisive():
+    assert _top_margin(np.zeros(5), relative=True) == float("-inf")
+    margins = [float("-inf")] * 6 + [0.5] * 5
+    assert _smallest_safe_threshold(margins, [True] * 11, min_agreement=0.95, min_support=3) == 0.5
+    assert _smallest_safe_threshold([float("-inf")] * 6, [True] * 6, 0.95, 3) == float("inf")
+
+
+@pytest.mark.parametrize("scores", [[3.0, 1.0, 3.0, 0.5], [2.0, 2.0, 2.0, 2.0], [0.0, 5.0, 1.0, 5.0]])
+def test_short_circuit_returns_the_calibrated_top1(scores):
+    chunks = [f"chunk {i}" for i in range(len(scores))]
+    results, trace = cascade_rank_search(
+        "query", FixedBM25(scores), chunks, UnusedDense(), UnusedDense(), get_reranker_score=None,
+        weight_sparse=0.3, thresholds=CascadeThresholds(bm25_margin=0.0), k=3, tokenize=str.split,
+    )
+    assert trace['skipped_dense'] and trace['skipped_reranker']
+    assert results[0]['id'] == trace['bm25_top1']
+    # Ties are ordered by the higher index, like fuse_scores
+    assert results[0]['id'] == str(max(i for i, score in enumerate(scores) if score == max(scores)))
@@ -0,0 +1,76 @@
+import random
+
+from contextual_rag.context_assembly import ChunkSource, assemble_context
+
+
+def result(chunk_id: int, text: str, score: float) -> dict:
+    return {'id': str(chunk_id), 'score': score, 'metadata': {'text': text}}
+
+
+def random_document(seed: int, length: int) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice("abcdefghij ") for _ in range(length))
+
+
+def count_characters(text: str) -> int:
+    return len(text)
+
+
+def test_regular_chunks_keep_text_that_looks_like_a_preamble():
+    results = [
+        result(0, 'Intro line \n\n body text here', 0.5),
+        result(1, 'body text here and more', 0.9),
+    ]
+    context, _ = assemble_context(results, count_tokens=count_characters)
+
+    assert 'Intro line' in context
+    assert 'body text here and more' in context
+
+
+def test_contextual_chunks_drop_repeated_preambles():
+    document = random_document(0, 400)
+    results = [
+        result(0, f"Shared context \n\n {document[:250]}", 0.9),
+        result(1, f"Shared context \n\n {document[200:]}", 0.5),
+    ]
+    sources = [ChunkSource(0, 0, 250, "Shared context"), ChunkSource(0, 200, 400, "Shared context")]
+    context, report = assemble_context(results, max_tokens=10 ** 6, sources=sources, count_tokens=count_characters, contextual=True)
+
+    assert context == f"Shared context \n\n {document}"
+    assert report['tokens_saved'] > 0
+
+
+def test_bridging_chunk_merges_three_blocks_into_one_span():
+    document = random_document(1, 600)
+    sources = [ChunkSource(0, 0, 200), ChunkSource(0, 350, 600), ChunkSource(0, 150, 400)]
+    results = [result(0, document[0:200], 0.9), result(1, document[350:600], 0.8), result(2, document[150:400], 0.7)]
+
+    # Text merging (sources only) and exact offset merging (sources and documents)
+    for documents in (None, [document]):
+        context, report = assemble_context(
+            results, max_tokens=10 ** 6, sources=sources, documents=documents, count_tokens=count_characters,
+        )
+        assert context == document
+        assert report['blocks'] == 1
+
+
+def test_chunks_from_different_documents_are_not_merged():
+    shared = "x" * 25
+    results = [result(0, f"doc one text {shared}", 0.9), result(1, f"{shared} doc two text", 0.8)]
+    sources = [ChunkSource(0, 0, 38), ChunkSource(1, 0, 38)]
+
+    for chunk_sources in (sources, None):
+        context, report = assemble_context(results, sources=chunk_sources, count_tokens=count_characters)
+        assert context == f"doc one text {shared}\n{shared} doc two text"
+        assert report['blocks'] == 2
+
+
+def test_top_block_is_truncated_instead_of_dropped():
+    results = [result(i, random_document(10 + i, 400), 1.0 - i / 10) for i in range(4)]
+    context, report = assemble_context(results, max_tokens=100, count_tokens=count_characters)
+
+    assert context == results[0]['metadata']['text'][:100]
+    assert report['blocks_truncated'] == 1
+    assert report['blocks_dropped'] == 3
+    assert report['tokens_saved'] == 0
+    assert report['tokens_over_budget'] == report['naive_tokens'] - 100
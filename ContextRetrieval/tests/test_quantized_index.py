@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from contextual_rag.quantized_index import QuantizedDenseIndex
+
+QUANTIZATIONS = [None, "int8", "binary"]
+
+
+def embeddings(n: int = 50, dimensions: int = 64) -> np.ndarray:
+    return np.random.default_rng(0).standard_normal((n, dimensions)).astype(np.float32)
+
+
+@pytest.mark.parametrize("quantization", QUANTIZATIONS)
+def test_empty_index_returns_no_matches(quantization):
+    index = QuantizedDenseIndex(quantization=quantization)
+    assert index.query(embeddings(1)[0], top_k=5) == {'matches': []}
+    assert index.memory_per_chunk()['first_pass_bytes'] == 0
+
+
+@pytest.mark.parametrize("quantization", QUANTIZATIONS)
+def test_upsert_overwrites_existing_ids(quantization):
+    vectors = embeddings()
+    index = QuantizedDenseIndex.from_embeddings(vectors[:3], quantization=quantization)
+    index.query(vectors[0], top_k=3)  # build codes before the overwrite
+
+    index.upsert([('0', vectors[0])])
+    ids = [match['id'] for match in index.query(vectors[0], top_k=3)['matches']]
+    assert len(index) == 3
+    assert sorted(ids) == ['0', '1', '2']
+
+    # Row '1' now holds another vector and its new metadata
+    index.upsert([('1', vectors[10], {'text': 'replaced'})])
+    top = index.query(vectors[10], top_k=1, include_metadata=True)['matches'][0]
+    assert len(index) == 3
+    assert top['id'] == '1'
+    assert top['score'] == pytest.approx(1.0, abs=1e-5)
+    assert top['metadata'] == {'text': 'replaced'}
+
+
+@pytest.mark.parametrize("quantization", QUANTIZATIONS)
+def test_rescored_matches_use_exact_scores(quantization):
+    vectors = embeddings()
+    exact = QuantizedDenseIndex.from_embeddings(vectors, quantization=None)
+    index = QuantizedDenseIndex.from_embeddings(vectors, quantization=quantization, rescore_multiplier=50)
+
+    # With the shortlist covering the whole index, rescoring must reproduce exact search
+    for query in vectors[:5]:
+        expected = exact.query(query, top_k=5)['matches']
+        matches = index.query(query, top_k=5)['matches']
+        assert [match['id'] for match in matches] == [match['id'] for match in expected]
+        assert [match['score'] for match in matches] == pytest.approx([match['score'] for match in expected])
@@ -0,0 +1,71 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("rank_bm25")
+
+from rank_bm25 import BM25Okapi
+
+from contextual_rag.fusion import fuse_scores, rerank_batch
+from contextual_rag.loadtest import build_synthetic_service
+from contextual_rag.query_service import ServiceOverloaded, ServiceStopped
+
+
+def synthetic_service(**service_kwargs):
+    return build_synthetic_service(n_chunks=500, dimensions=32, **service_kwargs)
+
+
+@pytest.mark.parametrize("wait_before_stop", [0.0, 0.002])
+def test_stop_resolves_every_submitted_query(wait_before_stop):
+    async def run():
+        service, queries = synthetic_service(max_batch_size=8)
+        await service.start()
+        tasks = [asyncio.create_task(service.query(queries[i])) for i in range(40)]
+        await asyncio.sleep(wait_before_stop)
+        await service.stop()
+        outcomes = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=10)
+        with pytest.raises(ServiceStopped):
+            await service.query(queries[0])
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    assert all(isinstance(outcome, (dict, ServiceStopped)) for outcome in outcomes)
+    if wait_before_stop:
+        # Everything was admitted before stop(), so everything is answered
+        assert all(isinstance(outcome, dict) for outcome in outcomes)
+
+
+def test_admission_control_rejects_past_max_pending():
+    async def run():
+        service, queries = synthetic_service(max_pending=2)
+        async with service:
+            return await asyncio.gather(*(service.query(query) for query in queries[:5]), return_exceptions=True)
+
+    outcomes = asyncio.run(run())
+    assert sum(isinstance(outcome, dict) for outcome in outcomes) == 2
+    assert sum(isinstance(outcome, ServiceOverloaded) for outcome in outcomes) == 3
+
+
+def test_batched_results_match_per_query_fusion_and_reranking():
+    async def run(service, queries):
+        async with service:
+            return await asyncio.gather(*(service.query(query) for query in queries))
+
+    service, queries = synthetic_service(max_batch_size=16, max_wait_ms=50)
+    queries = queries[:12]
+    outputs = asyncio.run(run(service, queries))
+    assert max(output['batch_size'] for output in outputs) > 1
+
+    bm25 = BM25Okapi([chunk.split() for chunk in service.chunks])
+    for query, output in zip(queries, outputs):
+        dense = service.embedding_index.query(vector=service.embedding_model.embed_query(query), top_k=service.reranker_cutoff)
+        expected = fuse_scores(
+            np.array(bm25.get_scores(query.split())),
+            np.array([match['score'] for match in dense['matches']]),
+            np.array([int(match['id']) for match in dense['matches']]),
+            service.chunks, service.weight_sparse, service.k, service.reranker_cutoff,
+        )
+        rerank_batch([query], [expected], service.get_reranker_score)
+        assert [result['id'] for result in output['results']] == [result['id'] for result in expected]
+        assert [result['score'] for result in output['results']] == pytest.approx([result['score'] for result in expected])
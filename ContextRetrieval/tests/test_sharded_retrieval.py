@@ -0,0 +1,47 @@
+import random
+
+import numpy as np
+import pytest
+
+pytest.importorskip("rank_bm25")
+
+from rank_bm25 import BM25Okapi
+
+from contextual_rag.fusion import fuse_scores
+from contextual_rag.sharded_retrieval import ShardedRetriever
+
+
+def build_corpus(n_chunks: int = 300, dimensions: int = 32):
+    rng = random.Random(0)
+    vocabulary = [f"term{i}" for i in range(150)]
+    chunks = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(5, 60))) for _ in range(n_chunks)]
+    embeddings = np.random.default_rng(0).standard_normal((n_chunks, dimensions)).astype(np.float32)
+    queries = [" ".join(rng.choice(vocabulary + ["unknown"]) for _ in range(rng.randint(1, 6))) for _ in range(25)]
+    return chunks, embeddings, queries
+
+
+def unsharded_search(query, query_embedding, bm25, chunks, embeddings, weight_sparse, k, reranker_cutoff):
+    # fusion_rank_search with an exact in-memory dense index
+    vectors = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarities = vectors @ (query_embedding / np.linalg.norm(query_embedding))
+    dense_indices = np.argsort(similarities, kind="stable")[::-1][:reranker_cutoff]
+    bm25_scores = np.array(bm25.get_scores(query.split()))
+    return fuse_scores(bm25_scores, similarities[dense_indices], dense_indices, chunks, weight_sparse, k, reranker_cutoff)
+
+
+@pytest.mark.parametrize("mp_context", ["fork", "spawn"])
+def test_sharded_matches_unsharded(mp_context):
+    chunks, embeddings, queries = build_corpus()
+    bm25 = BM25Okapi([chunk.split() for chunk in chunks])
+    query_embeddings = np.random.default_rng(1).standard_normal((len(queries), embeddings.shape[1])).astype(np.float32)
+
+    with ShardedRetriever(bm25, chunks, embeddings, n_shards=3, tokenize=str.split, mp_context=mp_context) as retriever:
+        # Global IDF and avgdl are shared, so BM25 scores are bit-identical to the unsharded index
+        for query in queries:
+            assert np.array_equal(retriever.bm25_scores(query), np.array(bm25.get_scores(query.split())))
+
+        sharded = retriever.search_batch(queries, query_embeddings, weight_sparse=0.3, k=5, reranker_cutoff=20)
+    for query, query_embedding, results in zip(queries, query_embeddings, sharded):
+        expected = unsharded_search(query, query_embedding, bm25, chunks, embeddings, 0.3, 5, 20)
+        assert [result['id'] for result in results] == [result['id'] for result in expected]
+        assert [result['score'] for result in results] == pytest.approx([result['score'] for result in expected], abs=1e-6)
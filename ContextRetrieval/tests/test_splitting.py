@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from contextual_rag.splitting import MARKDOWN_SEPARATORS, OffsetTextSplitter, split_documents
+
+# Markdown-ish fragments that hit every separator, including the regex-looking ones
+FRAGMENTS = [
+    "word", "longerword", "x" * 120, " ", "  ", "\n", "\n\n", "\n\n\n", "\n# ", "\n## ", "\n###### ",
+    "```\n", "\n***\n", "\n*****\n", "\n---\n", "\n_____\n", "#", "*", "-", "_", "\t",
+]
+
+
+def random_document(rng: random.Random, n_fragments: int) -> str:
+    return "".join(rng.choice(FRAGMENTS) for _ in range(n_fragments))
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(800, 200), (60, 15), (25, 0)])
+def test_chunks_match_langchain(chunk_size, chunk_overlap):
+    rng = random.Random(chunk_size)
+    reference = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        strip_whitespace=True,
+        separators=MARKDOWN_SEPARATORS,
+    )
+    splitter = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=MARKDOWN_SEPARATORS)
+    for _ in range(300):
+        text = random_document(rng, rng.randint(0, 400))
+        assert splitter.split_text(text) == reference.split_text(text)
+
+
+def test_offsets_point_into_the_document():
+    rng = random.Random(0)
+    splitter = OffsetTextSplitter(chunk_size=100, chunk_overlap=20, separators=MARKDOWN_SEPARATORS)
+    for _ in range(100):
+        text = random_document(rng, rng.randint(0, 300))
+        for span in splitter.split_text_with_offsets(text):
+            assert text[span.start:span.end] == span.text
+
+
+def test_process_pool_matches_in_process():
+    rng = random.Random(1)
+    texts = [random_document(rng, 300) for _ in range(20)]
+    splitter = OffsetTextSplitter(separators=MARKDOWN_SEPARATORS)
+    assert split_documents(texts, splitter, max_workers=2, chunksize=4) == split_documents(texts, splitter, max_workers=1)
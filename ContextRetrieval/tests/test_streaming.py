@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from contextual_rag.evaluation import create_answer_chain
+from contextual_rag.streaming import StreamMetrics, get_stream_answer, stream_rag_answer, summarize_stream_metrics
+
+ANSWER = "Use the Convert Space to convert the weights to safetensors."
+
+
+def fake_stream_answer():
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content=ANSWER)]))
+    return get_stream_answer(create_answer_chain(llm))
+
+
+def retrieve(query):
+    time.sleep(0.01)
+    return [{'id': '0', 'score': 1.0, 'metadata': {'text': "The Convert Space converts .bin weights."}}]
+
+
+def test_stream_rag_answer_yields_tokens_and_records_metrics():
+    stream = stream_rag_answer("How do I convert weights?", retrieve, fake_stream_answer())
+    tokens = list(stream)
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == ANSWER
+    metrics = stream.metrics
+    assert metrics.tokens == len(tokens)
+    assert metrics.retrieval_seconds >= 0.01
+    assert metrics.time_to_first_token >= metrics.retrieval_seconds
+    assert metrics.tokens_per_second > 0
+
+
+def test_stream_rag_answer_records_into_given_metrics():
+    metrics = StreamMetrics()
+    stream = stream_rag_answer("How do I convert weights?", retrieve, fake_stream_answer(), metrics=metrics)
+
+    assert stream.metrics is metrics
+    first = next(stream)
+    assert first and metrics.first_token_at is not None and metrics.end is None
+    list(stream)
+    assert metrics.end is not None
+    assert summarize_stream_metrics([metrics])['requests'] == 1
+
+
+def test_idle_time_before_iteration_is_not_counted():
+    stream = stream_rag_answer("How do I convert weights?", retrieve, fake_stream_answer())
+    time.sleep(0.2)  # the caller holds the stream before iterating it
+    list(stream)
+
+    assert 0.01 <= stream.metrics.retrieval_seconds < 0.2
+    assert stream.metrics.time_to_first_token < 0.2
+
+
+def test_stream_answer_alone_times_from_generation_start():
+    stream = fake_stream_answer()("The Convert Space converts .bin weights.", "How do I convert weights?")
+    time.sleep(0.2)
+    assert "".join(stream) == ANSWER
+    assert stream.metrics.request_start == stream.metrics.generation_start
+    assert stream.metrics.time_to_first_token < 0.2